@@ -0,0 +1,454 @@
+"""性能基准测试
+
+对地图生成、碰撞检测、坦克移动和绘制等热点路径计时，可同时测量 main.py 和 light.py
+两个版本。结果写入JSON文件，并可与保存的基准结果比较，耗时增长超过阈值时标记为退化。
+
+用法:
+    python benchmark.py                                   # 测量两个版本并打印结果
+    python benchmark.py --output results.json             # 保存结果
+    python benchmark.py --baseline baseline.json          # 与基准比较，有退化时返回码为1
+    python benchmark.py --variant light --scenario draw   # 只测量部分版本/场景
+"""
+import os
+
+# 使用SDL虚拟驱动，不创建窗口也不打开音频设备
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+
+import argparse
+import importlib
+import inspect
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+import pygame
+
+VARIANTS = ('main', 'light')
+DEFAULT_REPEAT = 30
+DEFAULT_THRESHOLD = 0.15
+SEED = 20240601
+
+# 碰撞场景的规模：(子弹数, 敌人数)
+COLLISION_SIZES = ((1, 4), (10, 20), (100, 200), (1000, 200))
+# 子弹移动场景的子弹数
+MOVE_BULLETS = 1000
+# 每次计时中坦克移动的步数
+MOVE_STEPS = 200
+# 敌人更新场景的敌人数
+CROWD_ENEMIES = 300
+
+
+# ==================== 场景准备 ====================
+def _load_variant(name):
+    """导入游戏模块并为其加载资源"""
+    module = importlib.import_module(name)
+    if module.resources is None:
+        module.resources = module.ResourceManager()
+        if hasattr(module.resources, 'prepare_for_display'):
+            module.resources.prepare_for_display()
+    return module
+
+
+def _make_map_manager(module, screen, seed):
+    """用固定种子创建地图，两个版本得到相同的地形"""
+    random.seed(seed)
+    if 'rng' in inspect.signature(module.MapManager).parameters:
+        return module.MapManager(screen, random.Random(seed))
+    return module.MapManager(screen)
+
+
+def _terrain_grids(map_manager):
+    """获取地图的所有瓦片索引：main.py 的地形由地形块组成，light.py 只有一个索引"""
+    terrain = map_manager.terrain
+    if hasattr(terrain, 'chunks'):
+        return [chunk.grid for chunk in terrain.chunks.values()]
+    return [terrain]
+
+
+def _make_enemy(module, map_manager, x, y, level):
+    """创建敌人坦克：main.py 的坦克把子弹放在地图共享的子弹存储中"""
+    screen = map_manager.screen
+    if 'bullet_store' in inspect.signature(module.EnemyTank).parameters:
+        return module.EnemyTank(x, y, level, screen, bullet_store=map_manager.bullet_store)
+    return module.EnemyTank(x, y, level, screen)
+
+
+def _add_bullet(module, map_manager, tank, x, y, direction):
+    """给坦克添加一颗子弹"""
+    store = getattr(map_manager, 'bullet_store', None)
+    if store is None:
+        tank.bullets.append(module.Bullet(x, y, direction, map_manager.screen))
+    else:
+        store.add(module.Bullet(direction), tank, x, y)
+
+
+def _make_laser(module, screen, x, y, direction):
+    """创建激光：main.py 的激光不保存screen，绘制时传入"""
+    if 'screen' in inspect.signature(module.LaserBeam).parameters:
+        return module.LaserBeam(x, y, direction, screen)
+    return module.LaserBeam(x, y, direction)
+
+
+def _random_open_position(rng, map_manager, size):
+    """在不与实心地形重叠的位置随机取一个坐标"""
+    width, height = map_manager.screen.get_size()
+    while True:
+        x = rng.randrange(0, width - size)
+        y = rng.randrange(0, height - size)
+        if not map_manager.terrain.collides(pygame.Rect(x, y, size, size)):
+            return x, y
+
+
+class CollisionState:
+    """可重复的碰撞场景：每次计时前恢复地形、敌人、子弹和激光"""
+    def __init__(self, module, screen, bullets, enemies, lasers=0):
+        self.module = module
+        self.map_manager = _make_map_manager(module, screen, SEED)
+        self.tiles = [grid.tiles.copy() for grid in _terrain_grids(self.map_manager)]
+        rng = random.Random(SEED)
+
+        levels = ('level1', 'level2', 'level3', 'level4')
+        self.enemies = []
+        for i in range(enemies):
+            x, y = _random_open_position(rng, self.map_manager, module.TANK_SIZE)
+            self.enemies.append(_make_enemy(module, self.map_manager, x, y, levels[i % len(levels)]))
+        self.enemy_hp = [enemy.hp for enemy in self.enemies]
+
+        # 子弹轮流分给玩家和各个敌人
+        directions = [d for d in module.Direction if d != module.Direction.STOP]
+        self.bullet_specs = []
+        for i in range(bullets):
+            x, y = _random_open_position(rng, self.map_manager, 12)
+            owner = -1 if i % 2 == 0 or not self.enemies else (i // 2) % len(self.enemies)
+            self.bullet_specs.append((owner, x, y, rng.choice(directions)))
+
+        self.laser_specs = []
+        for i in range(lasers):
+            x, y = _random_open_position(rng, self.map_manager, module.TANK_SIZE)
+            self.laser_specs.append((x, y, directions[i % len(directions)]))
+
+    def prepare(self):
+        map_manager = self.map_manager
+        screen = map_manager.screen
+        for grid, tiles in zip(_terrain_grids(map_manager), self.tiles):
+            grid.tiles[:] = tiles
+            grid.dirty_cells.clear()
+        map_manager.powerups.clear()
+
+        store = getattr(map_manager, 'bullet_store', None)
+        if store is not None:
+            store.clear()
+        for enemy, hp in zip(self.enemies, self.enemy_hp):
+            enemy.hp = hp
+            enemy.bullets = []
+        map_manager.enemy_tanks = list(self.enemies)
+        tank_index = getattr(map_manager, 'tank_index', None)
+        if tank_index is not None:
+            tank_index.rebuild(map_manager.enemy_tanks)
+
+        player = map_manager.player_tank
+        player.hp = 10 ** 6
+        player.bullets = []
+        for owner, x, y, direction in self.bullet_specs:
+            tank = player if owner < 0 else self.enemies[owner]
+            _add_bullet(self.module, map_manager, tank, x, y, direction)
+        player.lasers = [_make_laser(self.module, screen, x, y, direction)
+                         for x, y, direction in self.laser_specs]
+
+    def run(self):
+        self.map_manager._check_collisions()
+
+
+# ==================== 场景定义 ====================
+def scenario_generate_blocks(module, screen):
+    """generate_blocks(1200, 1200) 生成一张完整地图"""
+    seeds = iter(range(SEED, SEED + 10 ** 6))
+    state = {}
+
+    def prepare():
+        state['rng'] = random.Random(next(seeds))
+
+    def run():
+        module.generate_blocks(module.SCREEN_WIDTH, module.SCREEN_HEIGHT, state['rng'])
+    return prepare, run
+
+
+def _collision_scenario(bullets, enemies):
+    def scenario(module, screen):
+        state = CollisionState(module, screen, bullets, enemies)
+        return state.prepare, state.run
+    scenario.__doc__ = f"_check_collisions：{bullets}颗子弹，{enemies}个敌人"
+    return scenario
+
+
+def scenario_laser_sweep(module, screen):
+    """_check_collisions：4道激光（四个方向各一道）扫过地形和20个敌人"""
+    state = CollisionState(module, screen, 0, 20, lasers=4)
+    return state.prepare, state.run
+
+
+def scenario_bullet_update(module, screen):
+    """子弹移动和出界剔除：1000颗子弹，200个敌人"""
+    state = CollisionState(module, screen, MOVE_BULLETS, 200)
+    map_manager = state.map_manager
+
+    def run():
+        store = getattr(map_manager, 'bullet_store', None)
+        if store is not None:
+            store.update()
+            store.cull()
+        else:
+            for tank in [map_manager.player_tank] + map_manager.enemy_tanks:
+                tank.bullets = [b for b in tank.bullets if b.update()]
+    return state.prepare, run
+
+
+def scenario_tank_move(module, screen):
+    """Tank.move：玩家坦克在完整地形中连续移动200步"""
+    map_manager = _make_map_manager(module, screen, SEED)
+    tank = map_manager.player_tank
+    start = tank.get_rect().topleft
+    directions = [d for d in module.Direction if d != module.Direction.STOP]
+    path = [directions[(i // 25) % len(directions)] for i in range(MOVE_STEPS)]
+
+    def prepare():
+        # main.py 的坦克以 x/y 记录位置，light.py 的坦克直接保存rect
+        if hasattr(tank, 'rect'):
+            tank.rect.topleft = start
+        else:
+            tank.x, tank.y = start
+
+    def run():
+        for direction in path:
+            tank.move(direction, map_manager.terrain)
+    return prepare, run
+
+
+def scenario_enemy_update(module, screen):
+    """EnemyTank.update：300个敌人各更新一帧（AI、移动、射击），main.py 的敌人互相阻挡并沿流场移动"""
+    state = CollisionState(module, screen, 0, CROWD_ENEMIES)
+    map_manager = state.map_manager
+    flow_field = getattr(map_manager, 'flow_field', None)
+    if flow_field is not None:
+        map_manager._update_flow_field()
+    starts = [(enemy.rect.topleft if hasattr(enemy, 'rect') else (enemy.x, enemy.y),
+               enemy.ai_timer, enemy.shoot_timer) for enemy in state.enemies]
+    tank_index = getattr(map_manager, 'tank_index', None)
+
+    def prepare():
+        for enemy, (start, ai_timer, shoot_timer) in zip(state.enemies, starts):
+            if hasattr(enemy, 'rect'):
+                enemy.rect.topleft = start
+            else:
+                enemy.x, enemy.y = start
+            enemy.ai_timer, enemy.shoot_timer = ai_timer, shoot_timer
+        state.prepare()
+
+    def run():
+        for enemy in map_manager.enemy_tanks:
+            if tank_index is not None:
+                enemy.update(map_manager.terrain, tank_index, flow_field)
+            else:
+                enemy.update(map_manager.terrain)
+    return prepare, run
+
+
+def scenario_flow_field(module, screen):
+    """FlowField.build：从玩家所在节点重建玩家周围的寻路流场（只有 main.py 有流场）"""
+    if not hasattr(module, 'FlowField'):
+        return None
+    map_manager = _make_map_manager(module, screen, SEED)
+
+    def run():
+        map_manager.flow_field.valid = False
+        map_manager._update_flow_field()
+    return None, run
+
+
+def _flow_repair_scenario(row, incremental):
+    def scenario(module, screen):
+        if not hasattr(module, 'FlowField'):
+            return None
+        map_manager = _make_map_manager(module, screen, SEED)
+        grid = _terrain_grids(map_manager)[0]
+        tiles = grid.tiles.copy()
+        bricks = [(int(col), int(r)) for r, col in np.argwhere(tiles == module.TILE_BRICK)]
+        if row:
+            # 砖块最多的一行，相当于一道横向激光清除整排砖块
+            busiest = max({r for _, r in bricks}, key=lambda r: sum(cell[1] == r for cell in bricks))
+            cells = [cell for cell in bricks if cell[1] == busiest]
+        else:
+            # 离玩家最近的砖块，相当于一颗子弹击碎一块砖块
+            player = map_manager.player_tank
+            cells = [min(bricks, key=lambda cell: abs(cell[0] * module.TILE_SIZE - player.x) +
+                         abs(cell[1] * module.TILE_SIZE - player.y))]
+
+        def prepare():
+            grid.tiles[:] = tiles
+            grid.dirty_cells.clear()
+            map_manager.destroyed_bricks.clear()
+            map_manager.flow_field.valid = False
+            map_manager._update_flow_field()
+
+        def run():
+            for cell in cells:
+                map_manager._remove_brick(cell)
+            if not incremental:
+                map_manager.flow_field.valid = False
+            map_manager._update_flow_field()
+        return prepare, run
+    target = '一整排砖块' if row else '一块砖块'
+    method = '增量修复' if incremental else '完整重建'
+    scenario.__doc__ = f"流场：摧毁{target}后{method}距离场（只有 main.py 有流场）"
+    return scenario
+
+
+def scenario_draw(module, screen):
+    """MapManager.draw + UIManager.draw_game_ui：绘制一帧游戏画面"""
+    map_manager = _make_map_manager(module, screen, SEED)
+    ui_manager = module.UIManager(screen)
+
+    def run():
+        map_manager.draw()
+        ui_manager.draw_game_ui(map_manager.player_tank)
+    # 首次绘制会预渲染地形图层，不计入测量
+    run()
+    return None, run
+
+
+SCENARIOS = {
+    'generate_blocks': scenario_generate_blocks,
+    **{f'collisions_{b}b_{e}e': _collision_scenario(b, e) for b, e in COLLISION_SIZES},
+    'laser_sweep': scenario_laser_sweep,
+    'bullet_update': scenario_bullet_update,
+    'tank_move': scenario_tank_move,
+    'enemy_update': scenario_enemy_update,
+    'flow_field': scenario_flow_field,
+    **{f'flow_{method}_{target}': _flow_repair_scenario(target == 'row', method == 'repair')
+       for target in ('brick', 'row') for method in ('repair', 'rebuild')},
+    'draw': scenario_draw,
+}
+
+
+# ==================== 计时与比较 ====================
+def measure(prepare, run, repeat):
+    """执行repeat次，只对run计时，返回以毫秒为单位的统计"""
+    times = []
+    for _ in range(repeat):
+        if prepare:
+            prepare()
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        'median_ms': statistics.median(times),
+        'min_ms': min(times),
+        'max_ms': max(times),
+        'runs': repeat,
+    }
+
+
+def run_benchmarks(variants, scenarios, repeat):
+    """依次测量每个版本的每个场景，返回结果字典"""
+    pygame.init()
+    screen = pygame.display.set_mode((1200, 1200))
+    results = {}
+    for name in variants:
+        module = _load_variant(name)
+        results[name] = {}
+        for scenario in scenarios:
+            timed = SCENARIOS[scenario](module, screen)
+            if timed is None:
+                print(f"{name:>6} | {scenario:<24} | 该版本不支持")
+                continue
+            prepare, run = timed
+            stats = measure(prepare, run, repeat)
+            results[name][scenario] = stats
+            print(f"{name:>6} | {scenario:<24} | 中位数 {stats['median_ms']:9.3f}ms | "
+                  f"最小 {stats['min_ms']:9.3f}ms")
+    pygame.quit()
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'seed': SEED,
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """与基准比较中位数耗时，返回退化项列表 [(版本, 场景, 基准ms, 当前ms, 比值)]"""
+    regressions = []
+    print(f"\n与基准比较（阈值 +{threshold:.0%}）:")
+    for name, scenarios in current['results'].items():
+        for scenario, stats in scenarios.items():
+            base = baseline.get('results', {}).get(name, {}).get(scenario)
+            if base is None:
+                print(f"{name:>6} | {scenario:<24} | 基准中无此项")
+                continue
+            ratio = stats['median_ms'] / base['median_ms']
+            flag = '退化' if ratio > 1 + threshold else ('提升' if ratio < 1 - threshold else '持平')
+            print(f"{name:>6} | {scenario:<24} | {base['median_ms']:9.3f}ms -> "
+                  f"{stats['median_ms']:9.3f}ms | x{ratio:5.2f} {flag}")
+            if ratio > 1 + threshold:
+                regressions.append((name, scenario, base['median_ms'], stats['median_ms'], ratio))
+    return regressions
+
+
+def print_variant_comparison(current):
+    """并列打印两个版本同一场景的耗时，检验优化版的实际效果"""
+    results = current['results']
+    if not all(name in results for name in VARIANTS):
+        return
+    print("\nlight.py 相对 main.py:")
+    for scenario, stats in results['main'].items():
+        other = results['light'].get(scenario)
+        if other:
+            ratio = other['median_ms'] / stats['median_ms']
+            print(f"{scenario:<24} | main {stats['median_ms']:9.3f}ms | "
+                  f"light {other['median_ms']:9.3f}ms | x{ratio:5.2f}")
+
+
+# ==================== 程序入口 ====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="坦克大战性能基准测试")
+    parser.add_argument("--variant", nargs="+", choices=VARIANTS, default=list(VARIANTS),
+                        help="要测量的版本（默认全部）")
+    parser.add_argument("--scenario", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS),
+                        help="要测量的场景（默认全部）")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"每个场景的计时次数（默认{DEFAULT_REPEAT}）")
+    parser.add_argument("--output", metavar="FILE", help="将结果写入JSON文件")
+    parser.add_argument("--baseline", metavar="FILE", help="与基准JSON文件比较")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"中位数耗时增长超过该比例视为退化（默认{DEFAULT_THRESHOLD}）")
+    args = parser.parse_args()
+
+    # 游戏模块按相对路径查找资源，并从当前目录导入map模块
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    current = run_benchmarks(args.variant, args.scenario, args.repeat)
+    print_variant_comparison(current)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已保存: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n发现{len(regressions)}项性能退化")
+            sys.exit(1)
@@ -2,6 +2,7 @@ import pygame
 import sys
 import time
 import random
+import numpy as np
 from enum import Enum
 from abc import ABC, abstractmethod
 import os
@@ -11,18 +12,23 @@ os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
 
 # 尝试导入地图生成模块
 try:
-    from map import generate_blocks
+    from map import generate_blocks, TILE_EMPTY, TILE_BRICK, TILE_IRON, SOLID_TILES
 except ImportError:
     print("Warning: Could not import map module, using default map")
+    TILE_EMPTY, TILE_BRICK, TILE_IRON = 0, 1, 2
+    SOLID_TILES = (TILE_BRICK, TILE_IRON)
     def generate_blocks(width, height):
-        bricks = [(x, y) for x in range(100, width - 100, 100)
-                  for y in range(100, height // 2, 100)]
-        irons = [(x, y) for x in range(200, width - 200, 200)
-                 for y in range(150, height // 2, 150)]
+        bricks = [(x, y) for x in range(96, width - 100, 96)
+                  for y in range(96, height // 2, 96)]
+        irons = [(x, y) for x in range(192, width - 200, 192)
+                 for y in range(144, height // 2, 144)]
         trees = [(x, y) for x in range(300, width - 300, 300)
                  for y in range(200, height // 2, 200)]
         rivers = []
-        return bricks[:10], irons[:5], trees[:5], rivers
+        tiles = np.zeros((height // 24, width // 24), dtype=np.uint8)
+        for x, y in bricks[:10]: tiles[y // 24, x // 24] = TILE_BRICK
+        for x, y in irons[:5]: tiles[y // 24, x // 24] = TILE_IRON
+        return tiles, trees[:5], rivers
 
 # ==================== 常量定义 ====================
 SCREEN_WIDTH = 1200
@@ -238,6 +244,11 @@ class LaserBeam:
     
     def get_line(self):
         return self.start_pos, self.end_pos
+    
+    def get_line_rect(self):
+        # 激光线段的外接矩形，用于查询地形网格
+        (x1, y1), (x2, y2) = self.start_pos, self.end_pos
+        return pygame.Rect(min(x1, x2), min(y1, y2), abs(x2 - x1) + 1, abs(y2 - y1) + 1)
 
 # ==================== 坦克类 ====================
 class Tank:
@@ -285,7 +296,7 @@ class Tank:
         if self.is_appearing: self._update_appear_animation()
         if self.is_exploding: self._update_explode_animation()
     
-    def move(self, direction, barriers):
+    def move(self, direction, terrain):
         # **OPTIMIZATION**: 返回一个布尔值，表示是否成功移动，用于改进AI
         if direction == Direction.STOP: return True
         self.direction = direction
@@ -298,8 +309,8 @@ class Tank:
         
         self.rect.move_ip(dx, dy)
         
-        # 碰撞检测
-        if self.rect.collidelist(barriers) != -1:
+        # 碰撞检测：只查询坦克覆盖的地形格子
+        if terrain.collides(self.rect):
             self.rect.move_ip(-dx, -dy) # 发生碰撞，移回原位
             return False
             
@@ -422,12 +433,12 @@ class EnemyTank(Tank):
         self.shoot_interval = random.randint(config['shoot_interval'] - 10, config['shoot_interval'] + 10)
         self.shoot_timer = 0
     
-    def update(self, barriers):
+    def update(self, terrain):
         super().update() # 更新子弹等
         
         # **OPTIMIZATION**: 改进的AI逻辑
         self.ai_timer += 1
-        moved_successfully = self.move(self.current_ai_direction, barriers)
+        moved_successfully = self.move(self.current_ai_direction, terrain)
         
         # 如果撞墙或计时器到时，则重新决策
         if not moved_successfully or self.ai_timer >= self.ai_interval:
@@ -448,16 +459,42 @@ class EnemyTank(Tank):
         # 复用父类的动画和子弹绘制
         super().draw()
 
+# ==================== 地形空间索引 ====================
+class TerrainGrid:
+    # **OPTIMIZATION**: 直接使用uint8瓦片地图，按 (x // TILE_SIZE, y // TILE_SIZE) O(1) 定位格子
+    def __init__(self, tiles):
+        self.tiles = tiles
+        self.rows, self.cols = tiles.shape
+        self.dirty_cells = [] # 被摧毁的格子，供地形图层增量重绘
+    
+    def cells_in_rect(self, rect):
+        if rect.width <= 0 or rect.height <= 0: return []
+        return [(col, row)
+                for col in range(max(rect.left // TILE_SIZE, 0), min((rect.right - 1) // TILE_SIZE, self.cols - 1) + 1)
+                for row in range(max(rect.top // TILE_SIZE, 0), min((rect.bottom - 1) // TILE_SIZE, self.rows - 1) + 1)]
+    
+    def query(self, rect, kind=None):
+        hits = [(cell, self.tiles.item(cell[1], cell[0])) for cell in self.cells_in_rect(rect)]
+        return [(cell, k) for cell, k in hits if (k == kind if kind is not None else k in SOLID_TILES)]
+    
+    def collides(self, rect):
+        return any(self.tiles.item(row, col) in SOLID_TILES for col, row in self.cells_in_rect(rect))
+    
+    def remove(self, cell):
+        self.tiles[cell[1], cell[0]] = TILE_EMPTY
+        self.dirty_cells.append(cell)
+    
+    def positions(self, kind):
+        return [(int(col) * TILE_SIZE, int(row) * TILE_SIZE) for row, col in np.argwhere(self.tiles == kind)]
+
 # ==================== 地图管理器 ====================
 class MapManager:
     def __init__(self, screen):
         self.screen = screen
-        self.brick_positions, self.iron_positions, self.tree_positions, river_data = \
-            generate_blocks(SCREEN_WIDTH, SCREEN_HEIGHT)
+        tiles, self.tree_positions, river_data = generate_blocks(SCREEN_WIDTH, SCREEN_HEIGHT)
         
-        # **OPTIMIZATION**: 预计算碰撞矩形列表
-        self.brick_rects = [pygame.Rect(pos[0], pos[1], TILE_SIZE, TILE_SIZE) for pos in self.brick_positions]
-        self.iron_rects = [pygame.Rect(pos[0], pos[1], TILE_SIZE, TILE_SIZE) for pos in self.iron_positions]
+        # **OPTIMIZATION**: 持久化的瓦片地图索引，取代逐帧扫描的碰撞矩形列表
+        self.terrain = TerrainGrid(tiles)
         
         self.river_images = []
         if resources and 'river' in resources.images:
@@ -465,6 +502,11 @@ class MapManager:
                 img = pygame.transform.scale(resources.images['river'], (w, h))
                 self.river_images.append((img, (x, y)))
         
+        # **OPTIMIZATION**: 静态地形和树木各自预渲染为离屏图层，首次绘制时生成
+        self.terrain_layer = None
+        self.tree_layer = None
+        self.tree_layer_rect = None
+        
         self.player_tank = None
         self.enemy_tanks = []
         self.powerups = []
@@ -503,13 +545,9 @@ class MapManager:
         self.enemy_tanks.append(enemy)
         self.total_enemies_spawned += 1
     
-    def get_all_barriers(self):
-        return self.brick_rects + self.iron_rects
-    
     def update(self):
-        barriers = self.get_all_barriers()
         self.player_tank.update()
-        for enemy in self.enemy_tanks: enemy.update(barriers)
+        for enemy in self.enemy_tanks: enemy.update(self.terrain)
         
         self.enemy_spawn_timer += 1
         if self.enemy_spawn_timer >= self.enemy_spawn_interval:
@@ -542,14 +580,14 @@ class MapManager:
         target_rects = [t.get_rect() for t in targets]
         for bullet in shooter.bullets[:]:
             collided = False
+            terrain_hits = self.terrain.query(bullet.get_rect())
             # 与砖块碰撞
-            hit_indices = bullet.get_rect().collidelistall(self.brick_rects)
-            if hit_indices:
-                for i in sorted(hit_indices, reverse=True):
-                    del self.brick_rects[i]
-                collided = True
+            for cell, kind in terrain_hits:
+                if kind == TILE_BRICK:
+                    self.terrain.remove(cell)
+                    collided = True
             # 与铁墙碰撞
-            if not collided and bullet.get_rect().collidelist(self.iron_rects) != -1:
+            if not collided and terrain_hits:
                 if isinstance(bullet, ChargedBullet) and bullet.charge_rate > 0.8:
                     pass # 蓄力弹可摧毁铁墙，此处省略
                 collided = True
@@ -564,6 +602,7 @@ class MapManager:
                             powerup_rect = pygame.Rect(target.rect.topleft, (TANK_SIZE, TANK_SIZE))
                             self.powerups.append((powerup_rect, ptype))
                         targets.pop(hit_index)
+                        target_rects.pop(hit_index)
                     collided = True
             if collided:
                 shooter.bullets.remove(bullet)
@@ -575,9 +614,8 @@ class MapManager:
         for laser in self.player_tank.lasers:
             laser_line = laser.get_line()
             
-            for i in range(len(self.brick_rects) - 1, -1, -1):
-                if self.brick_rects[i].clipline(laser_line):
-                    del self.brick_rects[i]
+            for cell, _ in self.terrain.query(laser.get_line_rect(), TILE_BRICK):
+                self.terrain.remove(cell)
 
             for i in range(len(self.enemy_tanks) - 1, -1, -1):
                 enemy = self.enemy_tanks[i]
@@ -589,10 +627,31 @@ class MapManager:
                             self.powerups.append((powerup_rect, ptype))
                         del self.enemy_tanks[i]
 
+    def _render_terrain_layers(self):
+        self.terrain_layer = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        for pos in self.terrain.positions(TILE_BRICK): self.terrain_layer.blit(resources.images['brick'], pos)
+        for pos in self.terrain.positions(TILE_IRON): self.terrain_layer.blit(resources.images['iron'], pos)
+        for img, pos in self.river_images: self.terrain_layer.blit(img, pos)
+        self.terrain.dirty_cells.clear()
+        
+        self.tree_layer = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+        tree_rects = [self.tree_layer.blit(resources.images['tree'], pos) for pos in self.tree_positions]
+        self.tree_layer_rect = tree_rects[0].unionall(tree_rects) if tree_rects else pygame.Rect(0, 0, 0, 0)
+    
+    def _redraw_terrain_cell(self, cell):
+        # 被摧毁的格子清空后，重绘与之重叠的河流（河流不与网格对齐）
+        rect = pygame.Rect(cell[0] * TILE_SIZE, cell[1] * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+        self.terrain_layer.fill((0, 0, 0), rect)
+        self.terrain_layer.set_clip(rect)
+        for img, pos in self.river_images: self.terrain_layer.blit(img, pos)
+        self.terrain_layer.set_clip(None)
+    
     def draw(self):
-        for rect in self.brick_rects: self.screen.blit(resources.images['brick'], rect)
-        for rect in self.iron_rects: self.screen.blit(resources.images['iron'], rect)
-        for img, pos in self.river_images: self.screen.blit(img, pos)
+        # **OPTIMIZATION**: 地形整体一次贴图，只重绘被摧毁的格子
+        if self.terrain_layer is None: self._render_terrain_layers()
+        for cell in self.terrain.dirty_cells: self._redraw_terrain_cell(cell)
+        self.terrain.dirty_cells.clear()
+        self.screen.blit(self.terrain_layer, (0, 0))
         
         for powerup_rect, ptype in self.powerups:
             image_key = f'food_{ptype}'
@@ -602,8 +661,7 @@ class MapManager:
         self.player_tank.draw()
         for enemy in self.enemy_tanks: enemy.draw()
         
-        for pos in self.tree_positions:
-            self.screen.blit(resources.images['tree'], pos)
+        self.screen.blit(self.tree_layer, self.tree_layer_rect, self.tree_layer_rect)
 
 # ==================== UI管理器 ====================
 class UIManager:
@@ -724,7 +782,7 @@ class TankBattle:
             elif keys[pygame.K_a] or keys[pygame.K_LEFT]: direction = Direction.LEFT
             elif keys[pygame.K_d] or keys[pygame.K_RIGHT]: direction = Direction.RIGHT
             
-            self.map_manager.player_tank.move(direction, self.map_manager.get_all_barriers())
+            self.map_manager.player_tank.move(direction, self.map_manager.terrain)
             self.map_manager.player_tank.update_charge()
             
             if self.map_manager.update():
@@ -2,6 +2,12 @@ import pygame
 import sys
 import time
 import random
+import argparse
+import bisect
+import threading
+import numpy as np
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from abc import ABC, abstractmethod
 import os
@@ -9,28 +15,79 @@ import os
 # 禁用pygame的提示信息
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
 
+from replay import InputRecorder, load_replay, decode_input
+
 # 尝试导入地图生成模块
 try:
-    from map import generate_blocks
+    from map import (generate_blocks, TILE_EMPTY, TILE_BRICK, TILE_IRON,
+                     TILE_TREE, TILE_RIVER, SOLID_TILES)
 except ImportError:
     print("Warning: Could not import map module, using default map")
-    def generate_blocks(width, height):
-        # 返回默认的简单地图
-        bricks = [(x, y) for x in range(100, width-100, 100) 
-                  for y in range(100, height//2, 100)]
-        irons = [(x, y) for x in range(200, width-200, 200) 
-                 for y in range(150, height//2, 150)]
+    TILE_EMPTY, TILE_BRICK, TILE_IRON, TILE_TREE, TILE_RIVER = range(5)
+    SOLID_TILES = (TILE_BRICK, TILE_IRON)
+    def generate_blocks(width, height, rng=None):
+        # 返回默认的简单地图（砖块和铁墙对齐到24像素网格）
+        bricks = [(x, y) for x in range(96, width-100, 96) 
+                  for y in range(96, height//2, 96)]
+        irons = [(x, y) for x in range(192, width-200, 192) 
+                 for y in range(144, height//2, 144)]
         trees = [(x, y) for x in range(300, width-300, 300) 
                 for y in range(200, height//2, 200)]
         rivers = []
-        return bricks[:10], irons[:5], trees[:5], rivers
+        tiles = np.zeros((height // 24, width // 24), dtype=np.uint8)
+        for (x, y), tile in [(pos, TILE_BRICK) for pos in bricks[:10]] + \
+                            [(pos, TILE_IRON) for pos in irons[:5]]:
+            tiles[y // 24, x // 24] = tile
+        return tiles, trees[:5], rivers
+
+# 地图池单独导入：导入失败只影响 --map-pool，不会让地图生成退回默认地图
+try:
+    from map_pool import MapPool
+except ImportError as e:
+    print(f"Warning: Could not import map_pool module ({e}), --map-pool is unavailable")
+    MapPool = None
 
 # ==================== 常量定义 ====================
 SCREEN_WIDTH = 1200
 SCREEN_HEIGHT = 1200
 FPS = 50
+# 逻辑帧率（固定步长），与渲染帧率FPS相互独立
+TICK_RATE = 50
+# 单帧计入的最长时间，避免长时间卡顿后逻辑追赶不完
+MAX_FRAME_TIME = 0.25
 TILE_SIZE = 24
 TANK_SIZE = 50
+BULLET_SIZE = 12
+# 爆炸动画（96px）以坦克左上角偏移(-25, -25)绘制，坦克的绘制范围向四周扩展该距离
+TANK_DRAW_MARGIN = 25
+TREE_SIZE = (60, 70)
+# 脏矩形模式下，变化区域超过屏幕面积的该比例时退回整屏刷新
+DIRTY_AREA_LIMIT = 0.5
+# 图集宽度；边长超过ATLAS_MAX_SPRITE的图片（如全屏图片）不打包进图集
+ATLAS_WIDTH = 512
+ATLAS_MAX_SPRITE = 256
+# 缩放图片缓存的容量（LRU淘汰）；蓄力子弹的图片按蓄力量化为若干档
+TRANSFORM_CACHE_SIZE = 64
+CHARGE_SCALE_LEVELS = 4
+# 大地图：世界由边长CHUNK_SIZE的地形块组成，每块单独生成；玩家所在块周围
+# ACTIVE_CHUNK_RADIUS圈内的块全速模拟，最多缓存CHUNK_LAYER_CACHE个地形块的预渲染图层
+CHUNK_SIZE = 1200
+CHUNK_TILES = CHUNK_SIZE // TILE_SIZE
+ACTIVE_CHUNK_RADIUS = 1
+CHUNK_LAYER_CACHE = 6
+# 寻路流场只覆盖玩家周围FLOW_RADIUS个格子，玩家离开边长FLOW_REGION个格子的区域时才重建；
+# 与玩家相距FLOW_REGION个格子以内的敌人直接朝玩家移动
+FLOW_RADIUS = 30
+FLOW_REGION = 6
+# 单屏地图的世界范围，也是子弹、激光和坦克活动范围的默认值
+SCREEN_RECT = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+# 对象池为每种子弹和激光最多保留的空闲对象数
+PROJECTILE_POOL_SIZE = 1024
+# 子弹数达到该值时先对所有子弹做向量化粗检测；子弹较少时numpy的调用开销超过逐个检测
+BULLET_BROADPHASE_MIN = 16
+# 帧性能分析：环形缓冲区保存的帧数，以及叠加层每隔多少帧重新渲染一次
+PROFILER_FRAMES = 240
+PROFILER_REFRESH = 10
 
 # ==================== 枚举类 ====================
 class Direction(Enum):
@@ -50,6 +107,9 @@ class GameState(Enum):
     GAME = "game"
     GAMEOVER = "gameover"
 
+# 录像中的方向编号即其在该列表中的下标
+DIRECTIONS = list(Direction)
+
 # ==================== 全局资源管理器 ====================
 resources = None
 
@@ -59,6 +119,13 @@ class ResourceManager:
     def __init__(self):
         self.images = {}
         self.sounds = {}
+        # 精灵表：(类型, 等级, Direction) -> 图片，绘制时直接按元组索引
+        self.sprites = {}
+        self.atlases = []
+        self.display_ready = False
+        # 缩放图片缓存：(图片名, 尺寸) -> 图片；后台线程预生成地图时也会访问，需要加锁
+        self.transform_cache = OrderedDict()
+        self.transform_lock = threading.Lock()
         self.load_resources()
     
     def load_resources(self):
@@ -176,9 +243,11 @@ class ResourceManager:
         # 特殊处理
         if 'tree' in self.images:
             try:
-                self.images['tree'] = pygame.transform.scale(self.images['tree'], (60, 70))
+                self.images['tree'] = pygame.transform.scale(self.images['tree'], TREE_SIZE)
             except:
                 pass
+            # 树冠中完全不透明的区域（相对树木左上角），被其完全遮住的物体无需绘制
+            self.tree_canopy = self._opaque_bands(self.images['tree'])
         
         # 加载音效
         sound_files = {
@@ -197,32 +266,134 @@ class ResourceManager:
                     def play(self):
                         pass
                 self.sounds[name] = DummySound()
-
+        
+        self._build_sprite_table()
+    
+    def prepare_for_display(self):
+        """显示窗口创建后调用：将所有图片转换为显示格式并打包进图集
+        
+        未转换的图片每次贴图都要做像素格式转换；打包后的精灵是图集的子表面，
+        精灵表随之重建。
+        """
+        if self.display_ready or pygame.display.get_surface() is None:
+            return
+        
+        opaque, translucent = [], []
+        for name, image in self.images.items():
+            if max(image.get_size()) > ATLAS_MAX_SPRITE:
+                # 全屏图片不进图集，只做格式转换
+                self.images[name] = image.convert_alpha() if self._has_transparency(image) else image.convert()
+            elif self._has_transparency(image):
+                translucent.append(name)
+            else:
+                opaque.append(name)
+        
+        # 不透明图片与带透明通道的图片分开打包，不透明精灵贴图时无需逐像素混合
+        self.atlases = [atlas for atlas in (self._pack_atlas(opaque, False),
+                                            self._pack_atlas(translucent, True)) if atlas]
+        self._build_sprite_table()
+        self.transform_cache.clear()
+        self.display_ready = True
+    
+    @staticmethod
+    def _opaque_bands(image):
+        """获取图片中由完全不透明的整行组成的最宽横带和由整列组成的最宽竖带"""
+        mask = pygame.mask.from_surface(image, 254)
+        width, height = mask.get_size()
+        
+        def longest_run(flags):
+            best, start = (0, 0), None
+            for i, flag in enumerate(flags + [False]):
+                if flag and start is None:
+                    start = i
+                elif not flag and start is not None:
+                    if i - start > best[1]:
+                        best = (start, i - start)
+                    start = None
+            return best
+        
+        top, rows = longest_run([all(mask.get_at((x, y)) for x in range(width)) for y in range(height)])
+        left, cols = longest_run([all(mask.get_at((x, y)) for y in range(height)) for x in range(width)])
+        return [rect for rect in (pygame.Rect(0, top, width, rows), pygame.Rect(left, 0, cols, height))
+                if rect.width and rect.height]
+    
+    @staticmethod
+    def _has_transparency(image):
+        """检查图片是否含有非完全不透明的像素"""
+        if not image.get_flags() & pygame.SRCALPHA and image.get_colorkey() is None:
+            return False
+        width, height = image.get_size()
+        return pygame.mask.from_surface(image, 254).count() < width * height
+    
+    def _pack_atlas(self, names, alpha):
+        """按行（shelf）将一组图片打包进一张图集，并把图片替换为图集的子表面"""
+        if not names:
+            return None
+        names = sorted(names, key=lambda n: self.images[n].get_height(), reverse=True)
+        width = max([ATLAS_WIDTH] + [self.images[n].get_width() for n in names])
+        
+        placements = {}
+        x = y = shelf_height = 0
+        for name in names:
+            w, h = self.images[name].get_size()
+            if x + w > width:
+                x, y, shelf_height = 0, y + shelf_height, 0
+            placements[name] = pygame.Rect(x, y, w, h)
+            x += w
+            shelf_height = max(shelf_height, h)
+        
+        if alpha:
+            atlas = pygame.Surface((width, y + shelf_height), pygame.SRCALPHA).convert_alpha()
+            atlas.fill((0, 0, 0, 0))
+        else:
+            atlas = pygame.Surface((width, y + shelf_height)).convert()
+        for name, rect in placements.items():
+            if alpha:
+                # 先把colorkey透明转换为逐像素alpha，再叠加到全透明的图集上，即为逐像素原样复制
+                atlas.blit(self.images[name].convert_alpha(), rect, special_flags=pygame.BLEND_RGBA_ADD)
+            else:
+                atlas.blit(self.images[name], rect)
+            self.images[name] = atlas.subsurface(rect)
+        return atlas
+    
+    def _build_sprite_table(self):
+        """预先计算 (类型, 等级, Direction) -> 图片 的精灵表"""
+        dir_index = {Direction.UP: '1', Direction.DOWN: '2',
+                     Direction.LEFT: '3', Direction.RIGHT: '4'}
+        self.sprites = {}
+        for direction, index in dir_index.items():
+            for level in range(1, 4):
+                self.sprites[('tank', f'level{level}', direction)] = self.images.get(f'tank_L{level}_{index}')
+            for level in range(1, 5):
+                self.sprites[('enemy', f'level{level}', direction)] = self.images.get(f'enemy_{level}_{index}')
+            self.sprites[('bullet', None, direction)] = self.images.get(f'bullet_{direction.value}')
+    
+    def get_scaled(self, name, size):
+        """获取缩放后的图片，按 (图片名, 尺寸) 缓存，超出容量时淘汰最久未使用的"""
+        key = (name, size)
+        with self.transform_lock:
+            image = self.transform_cache.get(key)
+            if image is not None:
+                self.transform_cache.move_to_end(key)
+                return image
+            
+            image = pygame.transform.scale(self.images[name], size)
+            self.transform_cache[key] = image
+            if len(self.transform_cache) > TRANSFORM_CACHE_SIZE:
+                self.transform_cache.popitem(last=False)
+            return image
     
     def get_tank_image(self, level, direction):
         """获取坦克图片"""
-        if not isinstance(direction, Direction):
-            return self.images.get('tank_L3_1')  # 默认图片
-        dir_map = {Direction.UP: '1', Direction.DOWN: '2', 
-                  Direction.LEFT: '3', Direction.RIGHT: '4'}
-        key = f'tank_L{level[-1]}_{dir_map.get(direction, "1")}'
-        return self.images.get(key)
+        return self.sprites.get(('tank', level, direction), self.images.get('tank_L3_1'))
     
     def get_enemy_image(self, level, direction):
         """获取敌人图片"""
-        if not isinstance(direction, Direction):
-            return self.images.get('enemy_1_1')  # 默认图片
-        dir_map = {Direction.UP: '1', Direction.DOWN: '2', 
-                  Direction.LEFT: '3', Direction.RIGHT: '4'}
-        key = f'enemy_{level[-1]}_{dir_map.get(direction, "1")}'
-        return self.images.get(key)
+        return self.sprites.get(('enemy', level, direction), self.images.get('enemy_1_1'))
     
     def get_bullet_image(self, direction):
         """获取子弹图片"""
-        if not isinstance(direction, Direction):
-            return self.images.get('bullet_up')  # 默认图片
-        key = f'bullet_{direction.value}'
-        return self.images.get(key)
+        return self.sprites.get(('bullet', None, direction), self.images.get('bullet_up'))
 
 # ==================== 武器系统 ====================
 class Weapon(ABC):
@@ -240,56 +411,122 @@ class Weapon(ABC):
         if self.cooldown > 0:
             self.cooldown -= 1
 
+class ProjectilePool:
+    """子弹和激光的对象池：按类型保存已失效的对象，发射时重置后复用，减少分配和GC停顿"""
+    def __init__(self, limit=PROJECTILE_POOL_SIZE):
+        self.limit = limit
+        self.free = {}
+    
+    def acquire(self, cls, *args):
+        """取出一个cls类型的对象并用args重置；池中没有空闲对象时新建"""
+        free = self.free.get(cls)
+        if free:
+            obj = free.pop()
+            obj.reset(*args)
+            return obj
+        return cls(*args)
+    
+    def release(self, obj):
+        """回收一个已失效的对象"""
+        free = self.free.setdefault(type(obj), [])
+        if len(free) < self.limit:
+            free.append(obj)
+
+projectile_pool = ProjectilePool()
+
+# 各方向单位速度，子弹的速度向量为其乘以速度
+VELOCITY_SIGNS = {
+    Direction.LEFT: (-1, 0),
+    Direction.RIGHT: (1, 0),
+    Direction.UP: (0, -1),
+    Direction.DOWN: (0, 1),
+}
+
 class Bullet:
-    """普通子弹"""
-    def __init__(self, x, y, direction, screen, speed=10, damage=1):
-        self.x = x
-        self.y = y
+    """普通子弹：位置、速度等逐帧变化的数据保存在BulletStore的数组中，对象本身只是句柄
+    
+    使用__slots__且不保存screen，由对象池回收复用，reset与__init__参数相同。
+    """
+    __slots__ = ('direction', 'speed', 'damage', 'size', 'image', 'velocity', 'store', 'slot', 'owner')
+    
+    def __init__(self, direction, speed=10, damage=1):
+        self.reset(direction, speed, damage)
+    
+    def reset(self, direction, speed=10, damage=1):
+        """按新的发射参数重置子弹"""
         self.direction = direction
-        self.screen = screen
         self.speed = speed
         self.damage = damage
+        # 碰撞尺寸与图片无关，无窗口模拟和回放与正常游戏的结果一致
+        self.size = BULLET_SIZE
         # 安全获取图片
         if resources and hasattr(resources, 'get_bullet_image'):
             self.image = resources.get_bullet_image(direction)
         else:
             self.image = None
+        # 所属的存储、在存储数组中的下标和发射者，加入存储后设置
+        self.store = None
+        self.slot = -1
+        self.owner = None
         self._set_velocity()
     
     def _set_velocity(self):
         """设置速度向量"""
-        velocities = {
-            Direction.LEFT: (-self.speed, 0),
-            Direction.RIGHT: (self.speed, 0),
-            Direction.UP: (0, -self.speed),
-            Direction.DOWN: (0, self.speed)
-        }
-        self.velocity = velocities.get(self.direction, (self.speed, 0))
+        sx, sy = VELOCITY_SIGNS.get(self.direction, (1, 0))
+        self.velocity = (sx * self.speed, sy * self.speed)
     
-    def update(self):
-        """更新子弹位置"""
-        self.x += self.velocity[0]
-        self.y += self.velocity[1]
-        return 0 <= self.x <= SCREEN_WIDTH and 0 <= self.y <= SCREEN_HEIGHT
+    @property
+    def x(self):
+        return self.store.x.item(self.slot)
+    
+    @property
+    def y(self):
+        return self.store.y.item(self.slot)
+    
+    def sweep_rect(self):
+        """扫掠矩形：本逻辑帧从上一位置移动到当前位置经过的整个区域"""
+        store, i = self.store, self.slot
+        x0, x1 = sorted((int(store.prev_x.item(i)), int(store.x.item(i))))
+        y0, y1 = sorted((int(store.prev_y.item(i)), int(store.y.item(i))))
+        return pygame.Rect(x0, y0, x1 - x0 + self.size, y1 - y0 + self.size)
     
-    def draw(self):
-        """绘制子弹"""
+    def entry_distance(self, left, top, right, bottom):
+        """从本帧起点出发，子弹前沿碰到矩形（与扫掠矩形重叠）之前移动的距离，起点已重叠时为0"""
+        store, i = self.store, self.slot
+        vx, vy = self.velocity
+        if vx > 0:
+            distance = left - (int(store.prev_x.item(i)) + self.size)
+        elif vx < 0:
+            distance = int(store.prev_x.item(i)) - right
+        elif vy > 0:
+            distance = top - (int(store.prev_y.item(i)) + self.size)
+        elif vy < 0:
+            distance = int(store.prev_y.item(i)) - bottom
+        else:
+            distance = 0
+        return max(distance, 0)
+    
+    def draw(self, screen, x, y):
+        """以屏幕坐标 (x, y) 为中心绘制子弹，返回绘制区域"""
         if self.image:
-            self.screen.blit(self.image, (self.x - self.image.get_width()/2, self.y- self.image.get_height()/2))
+            return screen.blit(self.image, (x - self.image.get_width()/2, y- self.image.get_height()/2))
         else:
-            pygame.draw.rect(self.screen, (255, 255, 0), (self.x, self.y, 5, 5))
+            return pygame.draw.rect(screen, (255, 255, 0), (x, y, 5, 5))
     
     def get_rect(self):
         """获取碰撞矩形"""
-        if self.image:
-            return pygame.Rect(self.x, self.y, 
-                             self.image.get_width(), self.image.get_height())
-        return pygame.Rect(self.x, self.y, 5, 5)
+        return pygame.Rect(self.x, self.y, self.size, self.size)
 
 class ChargedBullet(Bullet):
     """蓄力子弹"""
-    def __init__(self, x, y, direction, screen, charge_rate):
-        super().__init__(x, y, direction, screen)
+    __slots__ = ('charge_rate',)
+    
+    def __init__(self, direction, charge_rate):
+        self.reset(direction, charge_rate)
+    
+    def reset(self, direction, charge_rate):
+        """按新的方向和蓄力比例重置子弹"""
+        super().reset(direction)
         self.charge_rate = max(0.1, charge_rate)  # 确保最小值
         self.speed *= (1 + self.charge_rate * 2)  # 速度加成
         self.damage = 1 + int(self.charge_rate * 3)  # 伤害加成
@@ -297,93 +534,340 @@ class ChargedBullet(Bullet):
         self._scale_image()
     
     def _scale_image(self):
-        """缩放子弹图片"""
-        if self.image and self.charge_rate > 0.3:
-            scale = 1 + self.charge_rate * 2
-            width = int(self.image.get_width() * scale)
-            height = int(self.image.get_height() * scale)
-            self.image = pygame.transform.scale(self.image, (width, height))
-            self.x -= (width - self.image.get_width()) / 2 * (scale - 1)
-            self.y -= (height - self.image.get_height()) / 2 * (scale - 1)
-            
+        """缩放子弹图片和碰撞尺寸"""
+        if self.charge_rate > 0.3:
+            # 碰撞尺寸按实际蓄力计算
+            self.size = int(BULLET_SIZE * (1 + self.charge_rate * 2))
+            if self.image:
+                # 只有图片的蓄力量化为少数几档（取最近的一档），同一档位复用缓存中的缩放图片
+                charge_level = round(self.charge_rate * CHARGE_SCALE_LEVELS) / CHARGE_SCALE_LEVELS
+                sprite_size = int(BULLET_SIZE * (1 + charge_level * 2))
+                self.image = resources.get_scaled(f'bullet_{self.direction.value}', (sprite_size, sprite_size))
+
+class BulletStore:
+    """一局游戏中所有子弹的结构数组存储
+    
+    位置、速度、尺寸、伤害和发射者分别保存在numpy数组中，存活的子弹紧凑地排在
+    前count个位置。移动、出界剔除、地形和坦克的粗检测对所有子弹一次完成，
+    只有可能发生碰撞的少数子弹再逐个精确处理。
+    """
+    FIELDS = (('x', np.float64), ('y', np.float64), ('prev_x', np.float64), ('prev_y', np.float64),
+              ('vx', np.float64), ('vy', np.float64), ('size', np.int64), ('half', np.int64),
+              ('damage', np.int64), ('owner', np.int64), ('seq', np.int64))
+    
+    def __init__(self, bounds, capacity=64):
+        # 子弹飞出该范围（活动区域）即消失
+        self.bounds = bounds
+        self.count = 0
+        self.handles = [None] * capacity
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        # 发射者编号：owner数组中保存编号，owners[编号]为对应的坦克
+        self.owner_ids = {}
+        self.owners = []
+        # 发射序号：同一发射者的子弹按序号排列即为其bullets列表中的顺序
+        self.next_seq = 0
+    
+    def __len__(self):
+        return self.count
+    
+    def _grow(self):
+        """容量翻倍"""
+        capacity = len(self.handles) * 2
+        self.handles.extend([None] * (capacity - len(self.handles)))
+        for name, _ in self.FIELDS:
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:self.count] = array[:self.count]
+            setattr(self, name, grown)
+    
+    def owner_id(self, tank):
+        """获取坦克的发射者编号"""
+        owner = self.owner_ids.get(tank)
+        if owner is None:
+            owner = self.owner_ids[tank] = len(self.owners)
+            self.owners.append(tank)
+        return owner
+    
+    def add(self, bullet, owner, x, y):
+        """把子弹放到 (x, y) 并加入存储和发射者的bullets列表"""
+        if self.count == len(self.handles):
+            self._grow()
+        i = self.count
+        self.count += 1
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        self.vx[i], self.vy[i] = bullet.velocity
+        self.size[i] = bullet.size
+        # 图片以子弹坐标为中心绘制，视野剔除用的半边长
+        self.half[i] = max(bullet.image.get_size()) // 2 + 1 if bullet.image else bullet.size
+        self.damage[i] = bullet.damage
+        self.owner[i] = self.owner_id(owner)
+        self.seq[i] = self.next_seq
+        self.next_seq += 1
+        self.handles[i] = bullet
+        bullet.store, bullet.slot, bullet.owner = self, i, owner
+        owner.bullets.append(bullet)
+        return bullet
+    
+    def remove(self, bullet):
+        """移除一颗子弹：末尾的子弹移到空出的位置，数组保持紧凑"""
+        i, last = bullet.slot, self.count - 1
+        if i != last:
+            for name, _ in self.FIELDS:
+                array = getattr(self, name)
+                array[i] = array[last]
+            moved = self.handles[i] = self.handles[last]
+            moved.slot = i
+        self.handles[last] = None
+        self.count = last
+        bullet.slot = -1
+        bullet.owner.bullets.remove(bullet)
+        projectile_pool.release(bullet)
+    
+    def remove_owner(self, tank):
+        """移除一个坦克发射的所有子弹（坦克被摧毁）"""
+        for bullet in tank.bullets[:]:
+            self.remove(bullet)
+    
+    def clear(self):
+        """移除所有子弹"""
+        for bullet in self.handles[:self.count]:
+            bullet.slot = -1
+            bullet.owner.bullets.clear()
+            projectile_pool.release(bullet)
+        self.handles[:self.count] = [None] * self.count
+        self.count = 0
+    
+    def _owner_mask(self, tanks):
+        """获取发射者在tanks中的子弹掩码"""
+        ids = [self.owner_ids[tank] for tank in tanks if tank in self.owner_ids]
+        return np.isin(self.owner[:self.count], ids)
+    
+    def save_positions(self):
+        """记录所有子弹在本逻辑帧开始时的位置，供渲染插值使用"""
+        n = self.count
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+    
+    def update(self, active=None):
+        """移动子弹；active为参与模拟的坦克，None表示全部
+        
+        飞出活动区域的子弹在碰撞检测之后由cull移除，出界前经过的路径仍参与碰撞。
+        """
+        n = self.count
+        if n == 0:
+            return
+        x, y = self.x[:n], self.y[:n]
+        if active is None:
+            x += self.vx[:n]
+            y += self.vy[:n]
+        else:
+            # 休眠敌人的子弹保持不动
+            moving = self._owner_mask(active)
+            x[moving] += self.vx[:n][moving]
+            y[moving] += self.vy[:n][moving]
+    
+    def cull(self, active=None):
+        """移除飞出活动区域的子弹；active为参与模拟的坦克，None表示全部"""
+        n = self.count
+        if n == 0:
+            return
+        x, y = self.x[:n], self.y[:n]
+        bounds = self.bounds
+        out = (x < bounds.left) | (x > bounds.right) | (y < bounds.top) | (y > bounds.bottom)
+        if active is not None:
+            out &= self._owner_mask(active)
+        # 从后往前移除，交换到前面的子弹都已检查过
+        for i in np.flatnonzero(out)[::-1]:
+            self.remove(self.handles[i])
+    
+    def _rects(self):
+        """所有子弹本帧的扫掠矩形 (左, 上, 宽, 高)，与 pygame.Rect 一样向零取整"""
+        n = self.count
+        x0, x1 = np.trunc(self.prev_x[:n]).astype(np.int64), np.trunc(self.x[:n]).astype(np.int64)
+        y0, y1 = np.trunc(self.prev_y[:n]).astype(np.int64), np.trunc(self.y[:n]).astype(np.int64)
+        size = self.size[:n]
+        left, top = np.minimum(x0, x1), np.minimum(y0, y1)
+        return left, top, np.maximum(x0, x1) - left + size, np.maximum(y0, y1) - top + size
+    
+    def touching_solid(self, terrain):
+        """粗检测：扫掠矩形覆盖了砖块或铁墙的子弹掩码
+        
+        只读取活动区域的瓦片数组；矩形超出该数组的子弹一律视为可能碰撞。
+        """
+        left, top, width, height = self._rects()
+        tiles, col0, row0 = terrain.window(self.bounds)
+        rows, cols = tiles.shape
+        c0 = left // TILE_SIZE - col0
+        c1 = (left + width - 1) // TILE_SIZE - col0
+        r0 = top // TILE_SIZE - row0
+        r1 = (top + height - 1) // TILE_SIZE - row0
+        outside = (c0 < 0) | (r0 < 0) | (c1 >= cols) | (r1 >= rows)
+        
+        # 每颗子弹最多覆盖 span_x x span_y 个格子，超出自身范围的下标重复取最后一格
+        span_x = int(width.max() + TILE_SIZE - 2) // TILE_SIZE + 1
+        span_y = int(height.max() + TILE_SIZE - 2) // TILE_SIZE + 1
+        c1 = np.clip(c1, 0, cols - 1)[:, None]
+        r1 = np.clip(r1, 0, rows - 1)[:, None]
+        col = np.minimum(np.clip(c0, 0, cols - 1)[:, None] + np.arange(span_x), c1)
+        row = np.minimum(np.clip(r0, 0, rows - 1)[:, None] + np.arange(span_y), r1)
+        kinds = tiles[row[:, :, None], col[:, None, :]]
+        solid = ((kinds == TILE_BRICK) | (kinds == TILE_IRON)).any(axis=(1, 2))
+        return solid | outside
+    
+    def touching(self, rects):
+        """粗检测：扫掠矩形与rects中任一矩形重叠的子弹掩码（与 Rect.colliderect 的判定相同）"""
+        left, top, width, height = self._rects()
+        if not rects:
+            return np.zeros(self.count, dtype=bool)
+        boxes = np.array([tuple(rect) for rect in rects], dtype=np.int64)
+        hit = ((left[:, None] < boxes[:, 0] + boxes[:, 2]) & (left[:, None] + width[:, None] > boxes[:, 0]) &
+               (top[:, None] < boxes[:, 1] + boxes[:, 3]) & (top[:, None] + height[:, None] > boxes[:, 1]))
+        return hit.any(axis=1)
+    
+    def in_order(self, mask, tanks):
+        """按发射者在tanks中的顺序、同一发射者按发射顺序，返回掩码选中的子弹"""
+        rank = np.full(len(self.owners), -1, dtype=np.int64)
+        for i, tank in enumerate(tanks):
+            if tank in self.owner_ids:
+                rank[self.owner_ids[tank]] = i
+        slots = np.flatnonzero(mask)
+        ranks = rank[self.owner[slots]]
+        slots, ranks = slots[ranks >= 0], ranks[ranks >= 0]
+        order = np.lexsort((self.seq[slots], ranks))
+        return [self.handles[i] for i in slots[order]]
+    
+    def draw(self, screen, alpha=1.0, camera=None):
+        """绘制视野内的所有子弹，返回绘制区域列表"""
+        n = self.count
+        if n == 0:
+            return []
+        x, y, px, py = self.x[:n], self.y[:n], self.prev_x[:n], self.prev_y[:n]
+        if alpha < 1:
+            rx, ry = px + (x - px) * alpha, py + (y - py) * alpha
+        else:
+            rx, ry = x, y
+        offset = camera.offset if camera else (0, 0)
+        
+        # 视野剔除：包围矩形覆盖从上一逻辑帧到当前位置之间所有可能的绘制位置
+        visible = np.arange(n)
+        if camera is not None:
+            half = self.half[:n]
+            lo_x, lo_y = np.minimum(px, x) - half, np.minimum(py, y) - half
+            hi_x, hi_y = np.maximum(px, x) + half, np.maximum(py, y) + half
+            view = camera.rect
+            visible = np.flatnonzero((lo_x < view.right) & (hi_x > view.left) &
+                                     (lo_y < view.bottom) & (hi_y > view.top))
+        
+        rects = []
+        for i in visible:
+            if camera is not None and camera.canopy:
+                box = pygame.Rect(lo_x[i], lo_y[i], hi_x[i] - lo_x[i], hi_y[i] - lo_y[i])
+                if not camera.sees(box):
+                    continue
+            rects.append(self.handles[i].draw(screen, rx[i] - offset[0], ry[i] - offset[1]))
+        return rects
 
 class LaserBeam:
-    """激光束"""
-    def __init__(self, x, y, direction, screen, duration=10):
+    """激光束；与子弹一样使用__slots__并由对象池复用"""
+    __slots__ = ('x', 'y', 'start_pos', 'direction', 'duration', 'damage', 'width', 'bounds',
+                 'end_x', 'end_y', 'end_pos', 'view_rect', 'beam_rect')
+    # 光束长度按该步长向上取整（碰撞范围从坐标较小的端点开始，可能略微越过另一端）
+    STEP = 10
+    
+    def __init__(self, x, y, direction, duration=10, bounds=None):
+        self.reset(x, y, direction, duration, bounds)
+    
+    def reset(self, x, y, direction, duration=10, bounds=None):
+        """按新的发射参数重置激光束"""
         self.x = x
         self.y = y
         self.start_pos = (x, y)
         self.direction = direction
-        self.screen = screen
         self.duration = duration
         self.damage = 5
         self.width = 10
+        # 激光射到该范围（活动区域）的边缘为止
+        self.bounds = bounds if bounds is not None else SCREEN_RECT
         self._calculate_endpoints()
     
     def _calculate_endpoints(self):
         """计算激光束的端点"""
+        bounds = self.bounds
         if self.direction == Direction.UP:
-            self.end_x, self.end_y = self.x, 0
+            self.end_x, self.end_y = self.x, bounds.top
         elif self.direction == Direction.DOWN:
-            self.end_x, self.end_y = self.x, SCREEN_HEIGHT
+            self.end_x, self.end_y = self.x, bounds.bottom
         elif self.direction == Direction.LEFT:
-            self.end_x, self.end_y = 0, self.y
+            self.end_x, self.end_y = bounds.left, self.y
         elif self.direction == Direction.RIGHT:
-            self.end_x, self.end_y = SCREEN_WIDTH, self.y
+            self.end_x, self.end_y = bounds.right, self.y
 
         self.end_pos = (self.end_x, self.end_y)
+        # 包围矩形（世界坐标）：整条光束加上最外层光晕的宽度
+        glow = (self.width + 8) // 2 + 1
+        self.view_rect = pygame.Rect(min(self.x, self.end_x) - glow, min(self.y, self.end_y) - glow,
+                                     abs(self.end_x - self.x) + 2 * glow, abs(self.end_y - self.y) + 2 * glow)
+        # 碰撞范围：光束是横向或纵向的，用一个宽为width的矩形表示
+        step = self.STEP
+        if self.direction in (Direction.UP, Direction.DOWN):
+            top = min(self.y, self.end_y)
+            length = (abs(self.end_y - self.y) // step + 1) * step
+            self.beam_rect = pygame.Rect(self.x - self.width // 2, top, self.width, length)
+        else:
+            left = min(self.x, self.end_x)
+            length = (abs(self.end_x - self.x) // step + 1) * step
+            self.beam_rect = pygame.Rect(left, self.y - self.width // 2, length, self.width)
     
     def update(self):
         """更新激光束"""
         self.duration -= 1
         return self.duration > 0
     
-    def draw(self):
-        """绘制激光束"""
+    def draw(self, screen, offset=(0, 0)):
+        """绘制激光束，返回绘制区域；offset为摄像机左上角的世界坐标"""
 
         main_color = (255, 255, 255) if self.duration % 4 > 1 else (255, 200, 200)
         glow_color_1 = (180, 100, 100)
         glow_color_2 = (100, 50, 50)
         
-        pygame.draw.line(self.screen, glow_color_2, self.start_pos, self.end_pos, self.width + 8)
-        pygame.draw.line(self.screen, glow_color_1, self.start_pos, self.end_pos, self.width + 4)
-        pygame.draw.line(self.screen, main_color, self.start_pos, self.end_pos, self.width)
+        start = (self.start_pos[0] - offset[0], self.start_pos[1] - offset[1])
+        end = (self.end_pos[0] - offset[0], self.end_pos[1] - offset[1])
+        rect = pygame.draw.line(screen, glow_color_2, start, end, self.width + 8)
+        pygame.draw.line(screen, glow_color_1, start, end, self.width + 4)
+        pygame.draw.line(screen, main_color, start, end, self.width)
+        return rect
     
-    def get_collision_rects(self):
-        """获取碰撞检测用的矩形列表"""
-        rects = []
-        if self.direction in [Direction.UP, Direction.DOWN]:
-            # 垂直激光
-            step = 10
-            current_y = min(self.y, self.end_y)
-            max_y = max(self.y, self.end_y)
-            while current_y <= max_y:
-                rects.append(pygame.Rect(self.x - self.width//2, current_y, 
-                                       self.width, step))
-                current_y += step
-        else:
-            # 水平激光
-            step = 10
-            current_x = min(self.x, self.end_x)
-            max_x = max(self.x, self.end_x)
-            while current_x <= max_x:
-                rects.append(pygame.Rect(current_x, self.y - self.width//2, 
-                                       step, self.width))
-                current_x += step
-        return rects
+    def hit_order(self, rect):
+        """矩形被光束覆盖的第一段的序号：命中的坦克沿光束从坐标较小的一端依次结算"""
+        beam = self.beam_rect
+        if self.direction in (Direction.UP, Direction.DOWN):
+            return max(0, (rect.top - beam.top) // self.STEP)
+        return max(0, (rect.left - beam.left) // self.STEP)
 
 # ==================== 坦克类 ====================
 class Tank:
     """玩家坦克类"""
-    def __init__(self, x, y, level='level3', screen=None):
+    def __init__(self, x, y, level='level3', screen=None, world_rect=None, active_rect=None, bullet_store=None):
         self.x = x
         self.y = y
         self.screen = screen
         self.level = level
+        # 坦克只能在世界范围内移动；子弹和激光限制在活动区域内（由地图管理器随玩家位置更新）
+        self.world_rect = world_rect if world_rect is not None else SCREEN_RECT
+        self.active_rect = active_rect if active_rect is not None else self.world_rect
+        # 子弹保存在地图共享的子弹存储中，由地图管理器统一移动；bullets为本坦克子弹的句柄列表
+        self.bullet_store = bullet_store if bullet_store is not None else BulletStore(self.active_rect)
         self.direction = Direction.UP
         self.speed = 5
         self.hp = 3
         self.max_hp = 3
+        # 上一逻辑帧的位置，用于渲染插值
+        self.prev_x, self.prev_y = x, y
+        # 包围矩形（世界坐标）：覆盖插值区间内的坦克和爆炸动画，用于视野剔除
+        self.view_rect = pygame.Rect(0, 0, 0, 0)
+        self._update_view_rect()
         
         # 射击系统
         self.shoot_mode = ShootMode.NORMAL
@@ -419,11 +903,15 @@ class Tank:
         if self.shoot_cooldown > 0:
             self.shoot_cooldown -= 1
         
-        # 更新子弹
-        self.bullets = [b for b in self.bullets if b.update()]
-        
         # 更新激光
-        self.lasers = [l for l in self.lasers if l.update()]
+        if self.lasers:
+            alive = []
+            for laser in self.lasers:
+                if laser.update():
+                    alive.append(laser)
+                else:
+                    projectile_pool.release(laser)
+            self.lasers = alive
         
         # 更新动画
         if self.is_appearing:
@@ -431,8 +919,30 @@ class Tank:
         if self.is_exploding:
             self._update_explode_animation()
     
-    def move(self, direction, barriers):
-        """移动坦克"""
+    def save_position(self):
+        """记录坦克在本逻辑帧开始时的位置，供渲染插值使用"""
+        self.prev_x, self.prev_y = self.x, self.y
+    
+    def _update_view_rect(self):
+        """更新包围矩形"""
+        size = TANK_SIZE + 2 * TANK_DRAW_MARGIN
+        self.view_rect.update(min(self.prev_x, self.x) - TANK_DRAW_MARGIN,
+                              min(self.prev_y, self.y) - TANK_DRAW_MARGIN,
+                              abs(self.x - self.prev_x) + size, abs(self.y - self.prev_y) + size)
+    
+    def render_pos(self, alpha):
+        """获取绘制位置：alpha为上一逻辑帧到当前逻辑帧之间的插值比例"""
+        if alpha >= 1:
+            return self.x, self.y
+        return (self.prev_x + (self.x - self.prev_x) * alpha,
+                self.prev_y + (self.y - self.prev_y) * alpha)
+    
+    def move(self, direction, terrain, tanks=None):
+        """移动坦克
+        
+        tanks为坦克索引（TankIndex）：给出时不能移动到与其他坦克新发生重叠的位置，
+        移动后更新自身在索引中的位置。
+        """
         if direction == Direction.STOP:
             return
         
@@ -449,16 +959,27 @@ class Tank:
         elif direction == Direction.DOWN:
             dy = self.speed
         
-        new_x = max(0, min(self.x + dx, SCREEN_WIDTH - TANK_SIZE))
-        new_y = max(0, min(self.y + dy, SCREEN_HEIGHT - TANK_SIZE))
+        world = self.world_rect
+        new_x = max(world.left, min(self.x + dx, world.right - TANK_SIZE))
+        new_y = max(world.top, min(self.y + dy, world.bottom - TANK_SIZE))
         
-        # 碰撞检测
+        # 碰撞检测（只查询新位置覆盖的地形格子）
         new_rect = pygame.Rect(new_x, new_y, TANK_SIZE, TANK_SIZE)
-        for barrier in barriers:
-            if new_rect.colliderect(barrier):
-                return
+        if terrain.collides(new_rect):
+            return
         
+        # 已经重叠的坦克不阻挡，让它们可以分开
+        if tanks is not None:
+            rect = self.get_rect()
+            for other in tanks.query(new_rect, exclude=self):
+                if not rect.colliderect(other.get_rect()):
+                    return
+        
+        old_x = self.x
         self.x, self.y = new_x, new_y
+        self._update_view_rect()
+        if tanks is not None:
+            tanks.moved(self, old_x)
     
     def shoot(self):
         """根据当前模式射击"""
@@ -495,9 +1016,8 @@ class Tank:
         if len(self.bullets) < self.max_bullets:
             bullet_x = self.x + TANK_SIZE / 2
             bullet_y = self.y + TANK_SIZE / 2
-            bullet = Bullet(bullet_x, bullet_y, self.direction, self.screen, 
-                          self.bullet_speed)
-            self.bullets.append(bullet)
+            self.bullet_store.add(projectile_pool.acquire(Bullet, self.direction, self.bullet_speed),
+                                  self, bullet_x, bullet_y)
             self.shoot_cooldown = self.max_cooldown
             if resources and 'fire' in resources.sounds:
                 resources.sounds['fire'].play()
@@ -507,10 +1027,8 @@ class Tank:
         if len(self.bullets) < self.max_bullets:
             bullet_x = self.x + TANK_SIZE // 2 - 2
             bullet_y = self.y + TANK_SIZE // 2 - 2
-            bullet = ChargedBullet(bullet_x, bullet_y, self.direction, 
-                                 self.screen, charge_rate)
-
-            self.bullets.append(bullet)
+            self.bullet_store.add(projectile_pool.acquire(ChargedBullet, self.direction, charge_rate),
+                                  self, bullet_x, bullet_y)
             self.shoot_cooldown = int(self.max_cooldown * (1 + charge_rate))
             if resources and 'fire' in resources.sounds:
                 resources.sounds['fire'].play()
@@ -519,7 +1037,7 @@ class Tank:
         """激光射击"""
         laser_x = self.x + TANK_SIZE / 2
         laser_y = self.y + TANK_SIZE / 2
-        laser = LaserBeam(laser_x, laser_y, self.direction, self.screen)
+        laser = projectile_pool.acquire(LaserBeam, laser_x, laser_y, self.direction, 10, self.active_rect)
         self.lasers.append(laser)
         self.shoot_cooldown = self.max_cooldown * 2
         # 可以添加激光音效
@@ -565,31 +1083,49 @@ class Tank:
             self.is_exploding = False
             self.explode_frame = 0
     
-    def draw(self):
-        """绘制坦克及相关元素"""
+    def draw(self, alpha=1.0, camera=None):
+        """绘制坦克及其激光（子弹由子弹存储统一绘制），返回绘制区域列表
+        
+        给定camera时只绘制包围矩形在视野内、且没有被树冠完全遮住的部分。
+        """
+        rects = []
+        offset = camera.offset if camera else (0, 0)
+        if camera is None or camera.sees(self.view_rect):
+            x, y = self.render_pos(alpha)
+            self._draw_body(x - offset[0], y - offset[1], rects)
+        
+        # 绘制激光
+        for laser in self.lasers:
+            if camera is None or camera.sees(laser.view_rect):
+                rects.append(laser.draw(self.screen, offset))
+        
+        return rects
+    
+    def _draw_body(self, x, y, rects):
+        """在屏幕坐标 (x, y) 绘制坦克本身及出场、爆炸动画，绘制区域追加到rects"""
         # 绘制坦克
         if not self.is_appearing:
             if resources:
-                image = resources.get_tank_image(self.level, self.direction)
+                image = resources.sprites.get(('tank', self.level, self.direction))
                 if image:
-                    self.screen.blit(image, (self.x, self.y))
+                    rects.append(self.screen.blit(image, (x, y)))
                 else:
                     # 如果没有图片，绘制一个简单的矩形
-                    pygame.draw.rect(self.screen, (0, 255, 0), (self.x, self.y, TANK_SIZE, TANK_SIZE))
+                    rects.append(pygame.draw.rect(self.screen, (0, 255, 0), (x, y, TANK_SIZE, TANK_SIZE)))
                     # 绘制方向指示器
-                    center_x = self.x + TANK_SIZE // 2
-                    center_y = self.y + TANK_SIZE // 2
+                    center_x = x + TANK_SIZE // 2
+                    center_y = y + TANK_SIZE // 2
                     if self.direction == Direction.UP:
-                        pygame.draw.line(self.screen, (255, 255, 255), (center_x, center_y), (center_x, self.y), 3)
+                        pygame.draw.line(self.screen, (255, 255, 255), (center_x, center_y), (center_x, y), 3)
                     elif self.direction == Direction.DOWN:
-                        pygame.draw.line(self.screen, (255, 255, 255), (center_x, center_y), (center_x, self.y + TANK_SIZE), 3)
+                        pygame.draw.line(self.screen, (255, 255, 255), (center_x, center_y), (center_x, y + TANK_SIZE), 3)
                     elif self.direction == Direction.LEFT:
-                        pygame.draw.line(self.screen, (255, 255, 255), (center_x, center_y), (self.x, center_y), 3)
+                        pygame.draw.line(self.screen, (255, 255, 255), (center_x, center_y), (x, center_y), 3)
                     elif self.direction == Direction.RIGHT:
-                        pygame.draw.line(self.screen, (255, 255, 255), (center_x, center_y), (self.x + TANK_SIZE, center_y), 3)
+                        pygame.draw.line(self.screen, (255, 255, 255), (center_x, center_y), (x + TANK_SIZE, center_y), 3)
             else:
                 # 如果没有resources，绘制简单图形
-                pygame.draw.rect(self.screen, (0, 255, 0), (self.x, self.y, TANK_SIZE, TANK_SIZE))
+                rects.append(pygame.draw.rect(self.screen, (0, 255, 0), (x, y, TANK_SIZE, TANK_SIZE)))
         
         # 绘制动画
         if self.is_appearing and resources:
@@ -597,22 +1133,14 @@ class Tank:
             if frame < 3:
                 appear_image = resources.images.get(f'appear_{frame}')
                 if appear_image:
-                    self.screen.blit(appear_image, (self.x, self.y))
+                    rects.append(self.screen.blit(appear_image, (x, y)))
         
         if self.is_exploding and resources:
             frame = self.explode_frame // 5
             if frame < 6:
                 boom_image = resources.images.get(f'boom_{frame}')
                 if boom_image:
-                    self.screen.blit(boom_image, (self.x - 25, self.y - 25))
-        
-        # 绘制子弹
-        for bullet in self.bullets:
-            bullet.draw()
-        
-        # 绘制激光
-        for laser in self.lasers:
-            laser.draw()
+                    rects.append(self.screen.blit(boom_image, (x - TANK_DRAW_MARGIN, y - TANK_DRAW_MARGIN)))
     
     def get_rect(self):
         """获取碰撞矩形"""
@@ -621,12 +1149,16 @@ class Tank:
 # ==================== 敌人坦克类 ====================
 class EnemyTank(Tank):
     """敌人坦克类"""
-    def __init__(self, x, y, level='level1', screen=None):
-        super().__init__(x, y, level, screen)
+    def __init__(self, x, y, level='level1', screen=None, rng=None, world_rect=None, active_rect=None,
+                 bullet_store=None):
+        super().__init__(x, y, level, screen, world_rect, active_rect, bullet_store)
+        self.rng = rng if rng is not None else random.Random()
         self.direction = Direction.DOWN
         self.ai_timer = 0
         self.ai_interval = 60
         self.current_ai_direction = Direction.DOWN
+        # 被挡住时随机游走，直到下一次AI决策再回到流场
+        self.wandering = False
         
         # 根据等级设置属性
         self._set_level_attributes()
@@ -647,18 +1179,29 @@ class EnemyTank(Tank):
         self.shoot_interval = config['shoot_interval']
         self.shoot_timer = 0
     
-    def update(self, barriers):
-        """更新敌人状态"""
+    def update(self, terrain, tanks=None, flow=None):
+        """更新敌人状态，tanks为其他敌人所在的坦克索引，flow为寻路流场"""
         super().update()
         
         # AI决策
         self.ai_timer += 1
         if self.ai_timer >= self.ai_interval:
-            self.current_ai_direction = random.choice(list(Direction)[:-1])  # 排除STOP
+            self.current_ai_direction = self.rng.choice(list(Direction)[:-1])  # 排除STOP
             self.ai_timer = 0
+            self.wandering = False
+        
+        # 沿流场走向目标；没有流场、已到达或无法到达目标时按AI决策的方向移动
+        direction = None
+        if flow is not None and not self.wandering:
+            direction = flow.direction(self.x, self.y, self.direction)
+        if direction is None:
+            direction = self.current_ai_direction
         
         # 移动
-        self.move(self.current_ai_direction, barriers)
+        position = (self.x, self.y)
+        self.move(direction, terrain, tanks)
+        if flow is not None and (self.x, self.y) == position:
+            self.wandering = True
         
         # 射击
         self.shoot_timer += 1
@@ -666,52 +1209,497 @@ class EnemyTank(Tank):
             self._shoot_normal()
             self.shoot_timer = 0
     
-    def draw(self):
-        """绘制敌人坦克"""
+    def _draw_body(self, x, y, rects):
+        """绘制敌人坦克本身及出场、爆炸动画"""
         if not self.is_appearing:
             if resources:
-                image = resources.get_enemy_image(self.level, self.direction)
+                image = resources.sprites.get(('enemy', self.level, self.direction))
                 if image:
-                    self.screen.blit(image, (self.x, self.y))
+                    rects.append(self.screen.blit(image, (x, y)))
                 else:
                     # 如果没有图片，绘制一个简单的矩形
-                    pygame.draw.rect(self.screen, (255, 0, 0), (self.x, self.y, TANK_SIZE, TANK_SIZE))
+                    rects.append(pygame.draw.rect(self.screen, (255, 0, 0), (x, y, TANK_SIZE, TANK_SIZE)))
             else:
                 # 如果没有resources，绘制简单图形
-                pygame.draw.rect(self.screen, (255, 0, 0), (self.x, self.y, TANK_SIZE, TANK_SIZE))
+                rects.append(pygame.draw.rect(self.screen, (255, 0, 0), (x, y, TANK_SIZE, TANK_SIZE)))
         
-        # 绘制动画和子弹（复用父类方法）
+        # 绘制动画
         if self.is_appearing and resources:
             frame = self.appear_frame // 10
             if frame < 3:
                 appear_image = resources.images.get(f'appear_{frame}')
                 if appear_image:
-                    self.screen.blit(appear_image, (self.x, self.y))
+                    rects.append(self.screen.blit(appear_image, (x, y)))
         
         if self.is_exploding and resources:
             frame = self.explode_frame // 5
             if frame < 6:
                 boom_image = resources.images.get(f'boom_{frame}')
                 if boom_image:
-                    self.screen.blit(boom_image, (self.x - 25, self.y - 25))
-        
-        for bullet in self.bullets:
-            bullet.draw()
+                    rects.append(self.screen.blit(boom_image, (x - TANK_DRAW_MARGIN, y - TANK_DRAW_MARGIN)))
+
+# ==================== 地形空间索引 ====================
+class TerrainGrid:
+    """基于uint8瓦片地图的地形索引，按 (x // TILE_SIZE, y // TILE_SIZE) 直接定位格子"""
+    def __init__(self, tiles):
+        # tiles[行, 列] 为 TILE_* 类型
+        self.tiles = tiles
+        self.rows, self.cols = tiles.shape
+        # 自上次重绘以来发生变化的格子，供地形图层增量重绘
+        self.dirty_cells = []
+    
+    def cells_in_rect(self, rect):
+        """获取矩形覆盖的所有格子坐标（裁剪到地图范围内）"""
+        if rect.width <= 0 or rect.height <= 0:
+            return []
+        col_start = max(rect.left // TILE_SIZE, 0)
+        col_end = min((rect.right - 1) // TILE_SIZE, self.cols - 1)
+        row_start = max(rect.top // TILE_SIZE, 0)
+        row_end = min((rect.bottom - 1) // TILE_SIZE, self.rows - 1)
+        return [(col, row) for col in range(col_start, col_end + 1)
+                for row in range(row_start, row_end + 1)]
+    
+    def kind_at(self, col, row):
+        """获取格子的瓦片类型"""
+        return self.tiles.item(row, col)
+    
+    def query(self, rect, kind=None):
+        """获取与矩形重叠的地形格子列表 [(格子, 类型), ...]，默认只返回砖块和铁墙"""
+        hits = []
+        for col, row in self.cells_in_rect(rect):
+            cell_kind = self.tiles.item(row, col)
+            if cell_kind == kind if kind is not None else cell_kind in SOLID_TILES:
+                hits.append(((col, row), cell_kind))
+        return hits
+    
+    def collides(self, rect):
+        """检查矩形是否与砖块或铁墙重叠"""
+        for col, row in self.cells_in_rect(rect):
+            if self.tiles.item(row, col) in SOLID_TILES:
+                return True
+        return False
+    
+    def remove(self, cell):
+        """移除一个地形格子（砖块被摧毁）"""
+        col, row = cell
+        self.tiles[row, col] = TILE_EMPTY
+        self.dirty_cells.append(cell)
+    
+    def positions(self, kind):
+        """获取指定类型地形的像素坐标列表"""
+        return [(int(col) * TILE_SIZE, int(row) * TILE_SIZE)
+                for row, col in np.argwhere(self.tiles == kind)]
+
+# ==================== 坦克空间索引 ====================
+class TankIndex:
+    """坦克的排序扫描（sort and sweep）索引：按x坐标排序保存坦克
+
+    所有坦克大小相同，与矩形在x方向重叠的坦克在排序后的列表中是连续的一段，二分查找
+    即可定位，只需再比较这一段坦克的y坐标。坦克移动时按原x坐标找到并重新插入。
+    """
+    def __init__(self):
+        self.xs = []
+        self.tanks = []
+        # 坦克加入索引的序号：查询结果按加入顺序返回，与遍历坦克列表的顺序一致
+        self.serial = {}
+        self.next_serial = 0
+
+    def __len__(self):
+        return len(self.tanks)
+
+    def add(self, tank):
+        """加入一辆坦克"""
+        self.serial[tank] = self.next_serial
+        self.next_serial += 1
+        self._insert(tank)
+
+    def remove(self, tank):
+        """移除一辆坦克"""
+        self._pop(tank, tank.x)
+        del self.serial[tank]
+
+    def moved(self, tank, old_x):
+        """坦克从old_x移动后更新其在索引中的位置"""
+        if tank.x != old_x:
+            self._pop(tank, old_x)
+            self._insert(tank)
+
+    def rebuild(self, tanks):
+        """按给定顺序重建索引"""
+        self.xs, self.tanks = [], []
+        self.serial.clear()
+        self.next_serial = 0
+        for tank in tanks:
+            self.add(tank)
+
+    def _insert(self, tank):
+        i = bisect.bisect_right(self.xs, tank.x)
+        self.xs.insert(i, tank.x)
+        self.tanks.insert(i, tank)
+
+    def _pop(self, tank, x):
+        i = bisect.bisect_left(self.xs, x)
+        while self.tanks[i] is not tank:
+            i += 1
+        del self.xs[i]
+        del self.tanks[i]
+
+    def query(self, rect, exclude=None):
+        """获取与矩形重叠的坦克列表（按加入顺序），exclude为要排除的坦克"""
+        if rect.width <= 0 or rect.height <= 0:
+            return []
+        lo = bisect.bisect_right(self.xs, rect.left - TANK_SIZE)
+        hi = bisect.bisect_left(self.xs, rect.right)
+        top, bottom = rect.top - TANK_SIZE, rect.bottom
+        hits = [tank for tank in self.tanks[lo:hi]
+                if top < tank.y < bottom and tank is not exclude]
+        if len(hits) > 1:
+            hits.sort(key=self.serial.__getitem__)
+        return hits
+
+# ==================== 寻路流场 ====================
+class FlowField:
+    """所有敌人共享的寻路流场：从目标所在节点出发在瓦片网格上广度优先搜索得到的距离场
+    
+    节点 (列, 行) 表示左上角位于该格子的坦克，坦克覆盖的SPAN×SPAN个格子都不是实心地形时
+    节点可通行。坦克坐标除以格子边长的余数不超过SLACK时正好覆盖所在节点的格子；余数为
+    SLACK + 1时在该轴上多覆盖一列（行），节点的格子仍在坦克的覆盖范围内。坦克在移动方向
+    的垂直轴上对齐节点时，沿可通行的节点移动不会撞上地形，因此转向前先对齐。
+    敌人只需比较所在节点四个相邻节点的距离即可得到方向。
+    砖块被摧毁时只会有节点变为可通行、距离只会变短，由open_cells从新通行的节点向外修复。
+    
+    流场只在玩家离开FLOW_REGION区域时重建，起点可能落后于玩家；离玩家（goal）足够近的
+    敌人不再查询流场，直接朝玩家移动。
+    """
+    SPAN = -(-TANK_SIZE // TILE_SIZE)
+    SLACK = SPAN * TILE_SIZE - TANK_SIZE
+    # 距离场中不可通行和尚未到达的节点
+    BLOCKED = -2
+    UNREACHED = -1
+    
+    def __init__(self):
+        # 网格左上角的世界格子和网格大小
+        self.col0 = self.row0 = 0
+        self.cols = self.rows = 0
+        # 网格中每个格子是否不是实心地形
+        self.free = None
+        # dist为四周加了一圈不可通行边框的网格按行展开的距离列表，width为加边框后的宽度
+        self.width = 2
+        self.dist = []
+        self.steps = {}
+        self.target = None
+        # 玩家当前所在的世界节点，每个逻辑帧更新
+        self.goal = None
+        # 地形变化后置为False，由地图管理器重建
+        self.valid = False
+    
+    def build(self, tiles, col0, row0, target):
+        """用瓦片数组（左上角为世界格子 (col0, row0)）重建距离场，target为目标的世界节点"""
+        rows, cols = tiles.shape
+        span = self.SPAN
+        free = ~np.isin(tiles, SOLID_TILES)
+        # 先按行、再按列把连续span个格子的可通行性相与，得到每个节点覆盖的格子是否全部可通行
+        band = free[:rows - span + 1].copy()
+        for i in range(1, span):
+            band &= free[i:rows - span + 1 + i]
+        block = band[:, :cols - span + 1].copy()
+        for i in range(1, span):
+            block &= band[:, i:cols - span + 1 + i]
+        walkable = np.zeros((rows + 2, cols + 2), dtype=bool)
+        walkable[1:rows - span + 2, 1:cols - span + 2] = block
+        
+        self.col0, self.row0 = col0, row0
+        self.cols, self.rows = cols, rows
+        self.free = free
+        self.width = cols + 2
+        self.steps = {Direction.UP: -self.width, Direction.DOWN: self.width,
+                      Direction.LEFT: -1, Direction.RIGHT: 1}
+        self.dist = np.where(walkable, self.UNREACHED, self.BLOCKED).ravel().tolist()
+        self.target = target
+        self.valid = True
+        
+        col, row = target[0] - col0, target[1] - row0
+        if not (0 <= col < cols and 0 <= row < rows):
+            return
+        start = (row + 1) * self.width + col + 1
+        dist, width = self.dist, self.width
+        dist[start] = 0
+        # 单一起点的广度优先搜索：节点按距离顺序入队，第一次到达即为最短距离
+        unreached = self.UNREACHED
+        queue = [start]
+        for i in queue:
+            d = dist[i] + 1
+            for j in (i - width, i + width, i - 1, i + 1):
+                if dist[j] == unreached:
+                    dist[j] = d
+                    queue.append(j)
+    
+    def open_cells(self, cells):
+        """一批世界格子（如一道激光清除的整排砖块）变为可通行后增量修复距离场
+        
+        只检查覆盖这些格子的节点，从新通行节点旁已到达的节点出发传播变短的距离，
+        距离没有变化的区域不会被访问。
+        """
+        span, width, dist = self.SPAN, self.width, self.dist
+        touched = set()
+        for col, row in cells:
+            col, row = col - self.col0, row - self.row0
+            if not (0 <= col < self.cols and 0 <= row < self.rows):
+                continue
+            self.free[row, col] = True
+            for node_row in range(max(row - span + 1, 0), min(row, self.rows - span) + 1):
+                for node_col in range(max(col - span + 1, 0), min(col, self.cols - span) + 1):
+                    touched.add((node_row, node_col))
+        
+        opened = []
+        for node_row, node_col in touched:
+            i = (node_row + 1) * width + node_col + 1
+            if (dist[i] == self.BLOCKED and
+                    self.free[node_row:node_row + span, node_col:node_col + span].all()):
+                dist[i] = self.UNREACHED
+                opened.append(i)
+        
+        frontier = {j for i in opened for j in (i - width, i + width, i - 1, i + 1) if dist[j] >= 0}
+        self._propagate(sorted(frontier, key=dist.__getitem__))
+    
+    def _propagate(self, frontier):
+        """从frontier中的节点（按距离从小到大）出发，向未到达或距离更远的节点传播距离"""
+        dist, width = self.dist, self.width
+        queue = deque(frontier)
+        while queue:
+            i = queue.popleft()
+            d = dist[i] + 1
+            for j in (i - width, i + width, i - 1, i + 1):
+                if dist[j] == self.UNREACHED or dist[j] > d:
+                    dist[j] = d
+                    queue.append(j)
+    
+    def direction(self, x, y, current=None):
+        """获取左上角位于 (x, y) 的坦克走向玩家的方向，已到达或无法到达时返回None
+        
+        离玩家FLOW_REGION个格子以内时沿相差较多的轴直接朝玩家移动，否则沿流场下坡，
+        优先保持current方向。要转向时若坦克在另一轴上没有对齐节点，先退回所在节点。
+        """
+        col, row = x // TILE_SIZE, y // TILE_SIZE
+        goal = self.goal
+        if goal is not None and abs(goal[0] - col) <= FLOW_REGION and abs(goal[1] - row) <= FLOW_REGION:
+            current = self._toward(goal[0] - col, goal[1] - row)
+        else:
+            current = self._downhill(col - self.col0, row - self.row0, current)
+        if current is None:
+            return None
+        if current in (Direction.UP, Direction.DOWN):
+            if x % TILE_SIZE > self.SLACK:
+                return Direction.LEFT
+        elif y % TILE_SIZE > self.SLACK:
+            return Direction.UP
+        return current
+    
+    def _downhill(self, col, row, current):
+        """流场中网格节点 (col, row) 走向距离更小的相邻节点的方向，优先保持current"""
+        if not (0 <= col < self.cols and 0 <= row < self.rows):
+            return None
+        i = (row + 1) * self.width + col + 1
+        d = self.dist[i]
+        if d <= 0:
+            return None
+        steps = self.steps
+        if self.dist[i + steps.get(current, 0)] == d - 1:
+            return current
+        return next(direction for direction, step in steps.items() if self.dist[i + step] == d - 1)
+    
+    @staticmethod
+    def _toward(dc, dr):
+        """沿相差较多的轴朝相差 (dc, dr) 个节点的目标移动的方向，已在同一节点时返回None"""
+        if dc == 0 and dr == 0:
+            return None
+        if abs(dc) >= abs(dr):
+            return Direction.RIGHT if dc > 0 else Direction.LEFT
+        return Direction.DOWN if dr > 0 else Direction.UP
+
+# ==================== 分块世界 ====================
+class TerrainChunk:
+    """一个地形块：块内坐标的瓦片索引、河流和世界坐标的树木"""
+    def __init__(self, cx, cy, tiles, trees, rivers):
+        self.cx, self.cy = cx, cy
+        self.rect = pygame.Rect(cx * CHUNK_SIZE, cy * CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE)
+        self.grid = TerrainGrid(tiles)
+        self.trees = [(x + self.rect.x, y + self.rect.y) for x, y in trees]
+        # 树冠中完全不透明的区域（世界坐标），无图片时树木绘制为实心矩形
+        bands = resources.tree_canopy if resources else [pygame.Rect((0, 0), TREE_SIZE)]
+        self.canopy = [band.move(x, y) for x, y in self.trees for band in bands]
+        # 河流以块内坐标绘制到块的地形图层上
+        self.rivers = rivers
+        self.river_images = []
+        if resources and 'river' in resources.images:
+            self.river_images = [resources.get_scaled('river', size) for _, size in rivers]
+        # 是否有砖块被摧毁；未修改的块离开活动区域后可以丢弃，需要时按种子重新生成
+        self.modified = False
+
+class ChunkedTerrain:
+    """由地形块组成的世界地形，接口与TerrainGrid相同但使用世界坐标
+    
+    地形块在第一次被访问时由loader(cx, cy)生成，内存占用只与已加载的块数有关。
+    """
+    def __init__(self, chunks_x, chunks_y, loader):
+        self.chunks_x, self.chunks_y = chunks_x, chunks_y
+        self.rect = pygame.Rect(0, 0, chunks_x * CHUNK_SIZE, chunks_y * CHUNK_SIZE)
+        self.loader = loader
+        self.chunks = {}
+    
+    def chunk(self, cx, cy):
+        """获取地形块，未加载时生成"""
+        chunk = self.chunks.get((cx, cy))
+        if chunk is None:
+            tiles, trees, rivers = self.loader(cx, cy)
+            chunk = self.chunks[(cx, cy)] = TerrainChunk(cx, cy, tiles, trees, rivers)
+        return chunk
+    
+    def chunks_in_rect(self, rect):
+        """获取与矩形重叠的所有地形块（裁剪到世界范围内）"""
+        rect = rect.clip(self.rect)
+        if rect.width <= 0 or rect.height <= 0:
+            return []
+        return [self.chunk(cx, cy)
+                for cy in range(rect.top // CHUNK_SIZE, (rect.bottom - 1) // CHUNK_SIZE + 1)
+                for cx in range(rect.left // CHUNK_SIZE, (rect.right - 1) // CHUNK_SIZE + 1)]
+    
+    def _single_chunk(self, rect):
+        """矩形完全落在世界内的一个块中时返回该块，否则返回None"""
+        cx, cy = rect.left // CHUNK_SIZE, rect.top // CHUNK_SIZE
+        if (cx == (rect.right - 1) // CHUNK_SIZE and cy == (rect.bottom - 1) // CHUNK_SIZE
+                and 0 <= cx < self.chunks_x and 0 <= cy < self.chunks_y):
+            return self.chunk(cx, cy)
+        return None
+    
+    def query(self, rect, kind=None):
+        """获取与矩形重叠的地形格子列表 [(世界格子, 类型), ...]，默认只返回砖块和铁墙"""
+        # 绝大多数矩形只落在一个块内，直接交给该块的索引
+        chunk = self._single_chunk(rect)
+        if chunk is not None:
+            if chunk.cx == 0 and chunk.cy == 0:
+                return chunk.grid.query(rect, kind)
+            hits = chunk.grid.query(rect.move(-chunk.rect.x, -chunk.rect.y), kind)
+            col0, row0 = chunk.cx * CHUNK_TILES, chunk.cy * CHUNK_TILES
+            return [((col + col0, row + row0), cell_kind) for (col, row), cell_kind in hits]
+        
+        hits = []
+        for chunk in self.chunks_in_rect(rect):
+            col0, row0 = chunk.cx * CHUNK_TILES, chunk.cy * CHUNK_TILES
+            for (col, row), cell_kind in chunk.grid.query(rect.move(-chunk.rect.x, -chunk.rect.y), kind):
+                hits.append(((col + col0, row + row0), cell_kind))
+        return hits
+    
+    def collides(self, rect):
+        """检查矩形是否与砖块或铁墙重叠"""
+        chunk = self._single_chunk(rect)
+        if chunk is not None:
+            if chunk.cx == 0 and chunk.cy == 0:
+                return chunk.grid.collides(rect)
+            return chunk.grid.collides(rect.move(-chunk.rect.x, -chunk.rect.y))
+        for chunk in self.chunks_in_rect(rect):
+            if chunk.grid.collides(rect.move(-chunk.rect.x, -chunk.rect.y)):
+                return True
+        return False
+    
+    def window(self, rect):
+        """获取与矩形重叠的地形块拼接成的瓦片数组，返回 (瓦片数组, 起始世界列, 起始世界行)"""
+        chunks = self.chunks_in_rect(rect)
+        first = chunks[0]
+        if len(chunks) == 1:
+            return first.grid.tiles, first.cx * CHUNK_TILES, first.cy * CHUNK_TILES
+        columns = len({chunk.cx for chunk in chunks})
+        rows = [[chunk.grid.tiles for chunk in chunks[i:i + columns]]
+                for i in range(0, len(chunks), columns)]
+        return np.block(rows), first.cx * CHUNK_TILES, first.cy * CHUNK_TILES
+    
+    def kind_at(self, col, row):
+        """获取世界格子的瓦片类型"""
+        chunk = self.chunk(col // CHUNK_TILES, row // CHUNK_TILES)
+        return chunk.grid.kind_at(col % CHUNK_TILES, row % CHUNK_TILES)
+    
+    def remove(self, cell):
+        """移除一个地形格子（砖块被摧毁），变化记录在所属块的dirty_cells中"""
+        col, row = cell
+        chunk = self.chunk(col // CHUNK_TILES, row // CHUNK_TILES)
+        chunk.grid.remove((col % CHUNK_TILES, row % CHUNK_TILES))
+        chunk.modified = True
+    
+    def count(self, kind):
+        """统计已加载的块中指定类型的格子数"""
+        return sum(int(np.count_nonzero(chunk.grid.tiles == kind)) for chunk in self.chunks.values())
+    
+    def unload_outside(self, rect):
+        """丢弃矩形范围外未被修改的地形块，返回被丢弃的块坐标"""
+        dropped = [key for key, chunk in self.chunks.items()
+                   if not chunk.modified and not chunk.rect.colliderect(rect)]
+        for key in dropped:
+            del self.chunks[key]
+        return dropped
+
+class Camera:
+    """跟随玩家的摄像机，rect为屏幕在世界中对应的区域"""
+    def __init__(self, width, height, world_rect):
+        self.rect = pygame.Rect(0, 0, width, height)
+        self.world_rect = world_rect
+        # 视野内树冠的不透明区域（世界坐标），由地图管理器每帧更新
+        self.canopy = []
+    
+    def follow(self, x, y):
+        """以世界坐标 (x, y) 为中心，并限制在世界范围内"""
+        self.rect.center = (int(x), int(y))
+        self.rect.clamp_ip(self.world_rect)
+    
+    @property
+    def offset(self):
+        return self.rect.topleft
+    
+    def sees(self, rect):
+        """视野剔除：包围矩形与视野相交，且没有被某一块树冠完全遮住时才需要绘制"""
+        if not self.rect.colliderect(rect):
+            return False
+        canopy = self.canopy
+        for i in rect.collidelistall(canopy):
+            if canopy[i].contains(rect):
+                return False
+        return True
 
 # ==================== 地图管理器 ====================
 class MapManager:
     """地图管理器"""
-    def __init__(self, screen):
+    def __init__(self, screen, rng=None, map_pool=None, world_chunks=1):
         self.screen = screen
-        self.brick_positions = []
-        self.iron_positions = []
-        self.tree_positions = []
-        self.river_positions = []
-        self.river_images = []
+        # 地图生成、出生位置、敌人AI和道具掉落共用同一个随机数生成器，
+        # 相同种子和相同输入会得到完全相同的一局游戏
+        self.rng = rng if rng is not None else random.Random()
+        # 预生成的地图池，提供时直接从中取地图而不再生成
+        self.map_pool = map_pool
+        
+        # 世界由 world_chunks × world_chunks 个地形块组成，默认为单屏地图
+        self.world_chunks = world_chunks
+        self.world_rect = pygame.Rect(0, 0, world_chunks * CHUNK_SIZE, world_chunks * CHUNK_SIZE)
+        self.terrain = None
+        # 活动区域：玩家所在块周围全速模拟的范围；原地更新，坦克、子弹和激光共享同一个Rect
+        self.active_rect = self.world_rect.copy()
+        self.active_chunk = None
+        # 所有坦克的子弹
+        self.bullet_store = BulletStore(self.active_rect)
+        self.camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, self.world_rect)
+        self.last_camera_offset = None
+        
+        # 地形块的预渲染图层：(cx, cy) -> 图层，只缓存最近绘制过的块（LRU淘汰）
+        self.chunk_layers = OrderedDict()
         
         # 游戏对象
         self.player_tank = None
         self.enemy_tanks = []
+        # 敌人坦克的空间索引，敌人移动时增量更新
+        self.tank_index = TankIndex()
+        # 敌人共享的寻路流场及其对应的 (目标节点, 活动地形块)
+        self.flow_field = FlowField()
+        self.flow_key = None
+        # 上次更新流场以来被摧毁的砖块格子
+        self.destroyed_bricks = []
         self.powerups = []
         self.explosions = []
         
@@ -720,60 +1708,120 @@ class MapManager:
         self.enemy_spawn_interval = 300
         self.total_enemies_spawned = 0
         self.max_enemies = 20
+        self.max_alive_enemies = 8
         self.level4_count = 0
         
+        # 帧性能分析器，开启时由主循环在每帧开始时设置
+        self.profiler = None
+        
         self._init_map()
         self._create_player_tank()
+        self._update_active_area()
         self._spawn_initial_enemies()
     
+    def tick(self, direction, switch_mode=False, fire_pressed=False, fire_released=False):
+        """推进一个逻辑帧：处理玩家输入、移动玩家、更新蓄力并更新地图，返回游戏是否结束
+        
+        按键事件在逻辑帧开始时统一处理，同样的逐帧输入总会得到同样的结果。
+        """
+        self.player_tank.save_position()
+        for enemy in self.enemy_tanks:
+            enemy.save_position()
+        self.bullet_store.save_positions()
+        
+        tank = self.player_tank
+        if switch_mode:
+            tank.switch_shoot_mode()
+        if fire_pressed:
+            if tank.shoot_mode == ShootMode.CHARGED:
+                tank.start_charging()
+            else:
+                tank.shoot()
+        if fire_released and tank.shoot_mode == ShootMode.CHARGED:
+            tank.release_charge()
+        
+        tank.move(direction, self.terrain)
+        self.player_tank.update_charge()
+        return self.update()
+    
     def _init_map(self):
-        """初始化地图"""
-        self.brick_positions, self.iron_positions, self.tree_positions, river_data = \
-            generate_blocks(SCREEN_WIDTH, SCREEN_HEIGHT)
+        """初始化分块地形"""
+        if self.world_chunks == 1:
+            # 单屏地图：唯一的地形块直接用本局的随机数生成器生成（或从地图池中取）
+            if self.map_pool is not None:
+                layout = self.map_pool.layout(self.rng.randrange(len(self.map_pool)))
+            else:
+                layout = generate_blocks(CHUNK_SIZE, CHUNK_SIZE, self.rng)
+            loader = lambda cx, cy: layout
+        else:
+            # 大地图：每个块的种子由世界种子和块坐标派生，按需生成，丢弃后可以原样重新生成
+            world_seed = self.rng.randrange(2 ** 32)
+            loader = lambda cx, cy: self._load_chunk(world_seed, cx, cy)
+        self.terrain = ChunkedTerrain(self.world_chunks, self.world_chunks, loader)
+    
+    def _load_chunk(self, world_seed, cx, cy):
+        """生成一个地形块（或按块种子从地图池中取）"""
+        chunk_seed = random.Random(f"{world_seed}:{cx}:{cy}").randrange(2 ** 32)
+        if self.map_pool is not None:
+            return self.map_pool.layout_for_seed(chunk_seed)
+        return generate_blocks(CHUNK_SIZE, CHUNK_SIZE, random.Random(chunk_seed))
+    
+    def _update_active_area(self):
+        """玩家进入新的地形块时更新活动区域，并丢弃远处未被修改的地形块"""
+        center = self.player_tank.get_rect().center
+        chunk = (center[0] // CHUNK_SIZE, center[1] // CHUNK_SIZE)
+        if chunk == self.active_chunk:
+            return
+        self.active_chunk = chunk
         
-        # 处理河流
-        self.river_positions = river_data
-        if resources and 'river' in resources.images:
-            for (x, y), (w, h) in river_data:
-                river_image = pygame.transform.scale(resources.images['river'], (w, h))
-                self.river_images.append(river_image)
+        radius = ACTIVE_CHUNK_RADIUS
+        area = pygame.Rect((chunk[0] - radius) * CHUNK_SIZE, (chunk[1] - radius) * CHUNK_SIZE,
+                           (radius * 2 + 1) * CHUNK_SIZE, (radius * 2 + 1) * CHUNK_SIZE).clip(self.world_rect)
+        self.active_rect.topleft = area.topleft
+        self.active_rect.size = area.size
+        
+        # 在活动区域外多保留一圈，避免在块边界来回移动时反复生成
+        for key in self.terrain.unload_outside(area.inflate(CHUNK_SIZE * 2, CHUNK_SIZE * 2)):
+            self.chunk_layers.pop(key, None)
     
     def _create_player_tank(self):
-        """创建玩家坦克"""
-        barriers = self.get_barriers()
-        
+        """创建玩家坦克（位于世界中央的地形块）"""
+        center = self.world_chunks // 2
+        area = pygame.Rect(center * CHUNK_SIZE, center * CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE)
         # 尝试在安全位置创建
         for _ in range(10):
-            x = random.randint(0, SCREEN_WIDTH - TANK_SIZE)
-            y = random.randint(SCREEN_HEIGHT // 2, SCREEN_HEIGHT - TANK_SIZE - 100)
+            x = self.rng.randint(area.left, area.right - TANK_SIZE)
+            y = self.rng.randint(area.centery, area.bottom - TANK_SIZE - 100)
             
-            if self._is_position_valid(x, y, barriers):
-                self.player_tank = Tank(x, y, 'level3', self.screen)
+            if self._is_position_valid(x, y):
+                self.player_tank = Tank(x, y, 'level3', self.screen, self.world_rect, self.active_rect,
+                                        self.bullet_store)
                 return
         
         # 默认位置
-        self.player_tank = Tank(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 100, 'level3', self.screen)
+        self.player_tank = Tank(area.centerx, area.bottom - 100, 'level3', self.screen,
+                                self.world_rect, self.active_rect, self.bullet_store)
     
     def _spawn_initial_enemies(self):
         """生成初始敌人"""
-        barriers = self.get_barriers()
         for _ in range(4):
-            self._spawn_enemy(barriers)
+            self._spawn_enemy()
     
-    def _spawn_enemy(self, barriers):
+    def _spawn_enemy(self):
         """生成单个敌人"""
         if self.total_enemies_spawned >= self.max_enemies:
             return
         
-        # 尝试找到有效位置
+        # 尝试在活动区域的上方找到有效位置
+        area = self.active_rect
         for _ in range(20):
-            x = random.randint(0, SCREEN_WIDTH - TANK_SIZE)
-            y = random.randint(50, 250)
+            x = self.rng.randint(area.left, area.right - TANK_SIZE)
+            y = self.rng.randint(area.top + 50, area.top + 250)
             
-            if self._is_position_valid(x, y, barriers, check_player=True):
+            if self._is_position_valid(x, y, check_player=True):
                 # 选择敌人类型
                 if self.level4_count < 3:
-                    enemy_type = random.choice(['level1', 'level2', 'level3', 'level4'])
+                    enemy_type = self.rng.choice(['level1', 'level2', 'level3', 'level4'])
                     if enemy_type == 'level4':
                         self.level4_count = 0
                     else:
@@ -782,24 +1830,24 @@ class MapManager:
                     enemy_type = 'level4'
                     self.level4_count = 0
                 
-                enemy = EnemyTank(x, y, enemy_type, self.screen)
+                enemy = EnemyTank(x, y, enemy_type, self.screen, self.rng, self.world_rect, self.active_rect,
+                                  self.bullet_store)
                 self.enemy_tanks.append(enemy)
+                self.tank_index.add(enemy)
                 self.total_enemies_spawned += 1
                 return
     
-    def _is_position_valid(self, x, y, barriers, check_player=False):
+    def _is_position_valid(self, x, y, check_player=False):
         """检查位置是否有效"""
         new_rect = pygame.Rect(x, y, TANK_SIZE, TANK_SIZE)
         
         # 检查障碍物
-        for barrier in barriers:
-            if new_rect.colliderect(barrier):
-                return False
+        if self.terrain.collides(new_rect):
+            return False
         
         # 检查其他坦克
-        for enemy in self.enemy_tanks:
-            if new_rect.colliderect(enemy.get_rect()):
-                return False
+        if self.tank_index.query(new_rect):
+            return False
         
         # 检查玩家坦克
         if check_player and self.player_tank:
@@ -808,44 +1856,50 @@ class MapManager:
         
         return True
     
-    def get_barriers(self):
-        """获取所有障碍物"""
-        barriers = []
-        
-        # 砖块
-        for pos in self.brick_positions:
-            barriers.append(pygame.Rect(pos[0], pos[1], TILE_SIZE, TILE_SIZE))
-        
-        # 铁墙
-        for pos in self.iron_positions:
-            barriers.append(pygame.Rect(pos[0], pos[1], TILE_SIZE, TILE_SIZE))
-        
-        return barriers
-    
     def update(self):
         """更新地图状态"""
-        barriers = self.get_barriers()
+        profiler = self.profiler
         
         # 更新玩家坦克
+        self._update_active_area()
+        enemies = self._active_enemies()
         self.player_tank.update()
+        if profiler:
+            profiler.mark('input')
+        
+        # 一次移动所有子弹：本帧新发射的敌人子弹在敌人更新中加入，下一帧才开始移动
+        shooters = None if self.world_chunks == 1 else [self.player_tank] + enemies
+        self.bullet_store.update(shooters)
+        if profiler:
+            profiler.mark('bullets')
         
-        # 更新敌人坦克
-        for enemy in self.enemy_tanks[:]:
-            enemy.update(barriers)
+        # 更新敌人坦克：只有活动区域内的敌人参与模拟，远处的敌人保持休眠
+        self._update_flow_field()
+        for enemy in enemies:
+            enemy.update(self.terrain, self.tank_index, self.flow_field)
         
         # 生成新敌人
         self.enemy_spawn_timer += 1
         if (self.enemy_spawn_timer >= self.enemy_spawn_interval and 
-            len(self.enemy_tanks) < 8 and self.total_enemies_spawned < self.max_enemies):
-            self._spawn_enemy(barriers)
+            len(self.enemy_tanks) < self.max_alive_enemies and self.total_enemies_spawned < self.max_enemies):
+            self._spawn_enemy()
             self.enemy_spawn_timer = 0
             self.enemy_spawn_interval = max(150, self.enemy_spawn_interval - 5)
+        if profiler:
+            profiler.mark('ai')
         
         # 更新道具
         self._update_powerups()
+        if profiler:
+            profiler.mark('powerups')
         
-        # 检查碰撞
+        # 检查碰撞，之后移除飞出活动区域的子弹
         game_over = self._check_collisions()
+        if profiler:
+            profiler.mark('collisions')
+        self.bullet_store.cull(shooters)
+        if profiler:
+            profiler.mark('bullets')
         
         # 检查游戏结束条件
         # 杀够一定数量的敌人或玩家坦克被摧毁
@@ -854,6 +1908,44 @@ class MapManager:
         
         return False
     
+    def _active_enemies(self):
+        """获取活动区域内的敌人"""
+        if self.world_chunks == 1:
+            return list(self.enemy_tanks)
+        return self.tank_index.query(self.active_rect)
+    
+    def _update_flow_field(self):
+        """玩家离开所在的FLOW_REGION区域或活动区域变化时重建流场，否则只为被摧毁的砖块增量修复
+        
+        重建的流场只覆盖玩家周围FLOW_RADIUS个格子（裁剪到活动区域内），大地图中的重建耗时
+        与单屏地图相当。
+        """
+        player = self.player_tank
+        node = (int(player.x) // TILE_SIZE, int(player.y) // TILE_SIZE)
+        field = self.flow_field
+        field.goal = node
+        key = (node[0] // FLOW_REGION, node[1] // FLOW_REGION, self.active_chunk)
+        if field.valid and key == self.flow_key:
+            if self.destroyed_bricks:
+                field.open_cells(self.destroyed_bricks)
+        else:
+            size = (2 * FLOW_RADIUS + 1) * TILE_SIZE
+            area = pygame.Rect((node[0] - FLOW_RADIUS) * TILE_SIZE, (node[1] - FLOW_RADIUS) * TILE_SIZE,
+                               size, size).clip(self.active_rect)
+            # window返回覆盖区域的整个地形块，裁剪到区域内
+            tiles, col0, row0 = self.terrain.window(area)
+            col, row = area.left // TILE_SIZE, area.top // TILE_SIZE
+            tiles = tiles[row - row0:row - row0 + area.height // TILE_SIZE,
+                          col - col0:col - col0 + area.width // TILE_SIZE]
+            field.build(tiles, col, row, node)
+            self.flow_key = key
+        self.destroyed_bricks.clear()
+    
+    def _remove_brick(self, cell):
+        """摧毁一块砖块，下次更新流场时修复"""
+        self.terrain.remove(cell)
+        self.destroyed_bricks.append(cell)
+    
     def _update_powerups(self):
         """更新道具"""
         player_rect = self.player_tank.get_rect()
@@ -866,137 +1958,257 @@ class MapManager:
                 self.player_tank.apply_powerup(ptype)
                 self.powerups.remove(powerup)
     
+    def _sweep_bullet(self, bullet, targets=None):
+        """扫掠碰撞：沿子弹本帧移动的路径找到最先碰到的地形或坦克并结算
+        
+        每颗子弹只查询一次扫掠矩形覆盖的格子，无论速度多快都不会穿过砖块和坦克。
+        targets为可能被击中的坦克，None时从坦克索引中查询扫掠矩形覆盖的活动敌人。
+        返回 (是否命中, 命中的坦克)：先碰到地形时摧毁最先碰到的那一排格子中的一块砖块
+        （没有砖块则被铁墙挡住），坦克为None；距离相同时地形优先。
+        """
+        sweep = bullet.sweep_rect()
+        
+        terrain_distance, front = None, []
+        for cell, kind in self.terrain.query(sweep):
+            left, top = cell[0] * TILE_SIZE, cell[1] * TILE_SIZE
+            distance = bullet.entry_distance(left, top, left + TILE_SIZE, top + TILE_SIZE)
+            if terrain_distance is None or distance < terrain_distance:
+                terrain_distance, front = distance, [(cell, kind)]
+            elif distance == terrain_distance:
+                front.append((cell, kind))
+        
+        if targets is None:
+            targets = self._active_enemies_in(sweep)
+        target, target_distance = None, None
+        for tank in targets:
+            rect = tank.get_rect()
+            if not sweep.colliderect(rect):
+                continue
+            distance = bullet.entry_distance(rect.left, rect.top, rect.right, rect.bottom)
+            if target_distance is None or distance < target_distance:
+                target, target_distance = tank, distance
+        
+        if terrain_distance is not None and (target_distance is None or terrain_distance <= target_distance):
+            for cell, kind in front:
+                if kind == TILE_BRICK:
+                    self._remove_brick(cell)
+                    break
+            return True, None
+        return target is not None, target
+    
+    def _active_enemies_in(self, rect):
+        """获取与矩形重叠的活动区域内的敌人（按敌人列表的顺序）"""
+        enemies = self.tank_index.query(rect)
+        if self.world_chunks == 1:
+            return enemies
+        active_rect = self.active_rect
+        return [enemy for enemy in enemies if active_rect.colliderect(enemy.get_rect())]
+    
+    def _kill_enemy(self, enemy, enemies):
+        """移除被摧毁的敌人及其子弹，特殊敌人掉落道具"""
+        self.enemy_tanks.remove(enemy)
+        self.tank_index.remove(enemy)
+        enemies.remove(enemy)
+        self.bullet_store.remove_owner(enemy)
+        if enemy.level == 'level4':
+            ptype = self.rng.choice(['gun', 'shell', 'tank', 'star'])
+            self.powerups.append((enemy.x, enemy.y, ptype))
+    
     def _check_collisions(self):
-        """检查所有碰撞"""
+        """检查所有碰撞（只涉及活动区域内的敌人）
+        
+        子弹较多时先对所有子弹一次性做粗检测，只有碰撞矩形覆盖了实心地形或目标坦克的
+        子弹才按原有顺序（玩家子弹、激光、各敌人的子弹）逐个精确处理。
+        """
+        enemies = self._active_enemies()
+        player = self.player_tank
+        player_rect = player.get_rect()
+        store = self.bullet_store
+        
+        if len(store) < BULLET_BROADPHASE_MIN:
+            player_bullets = player.bullets[:]
+            enemy_bullets = [bullet for enemy in enemies for bullet in enemy.bullets]
+        else:
+            own = store.owner[:len(store)] == store.owner_id(player)
+            solid = store.touching_solid(self.terrain)
+            enemy_rects = [enemy.get_rect() for enemy in enemies]
+            player_bullets = store.in_order(
+                own & (solid | store.touching(enemy_rects)), [player])
+            enemy_bullets = store.in_order(~own & (solid | store.touching([player_rect])), enemies)
+        
         # 玩家子弹碰撞检测
-        for bullet in self.player_tank.bullets[:]:
-            bullet_rect = bullet.get_rect()
+        for bullet in player_bullets:
+            hit, enemy = self._sweep_bullet(bullet)
+            if not hit:
+                continue
+            # 与敌人碰撞（enemy为None时被砖块、铁墙挡住）
+            if enemy is not None and enemy.take_damage(bullet.damage):
+                self._kill_enemy(enemy, enemies)
+            store.remove(bullet)
+            if resources and 'bang' in resources.sounds:
+                resources.sounds['bang'].play()
+        
+        # 玩家激光碰撞检测：只读取光束所在行（列）的格子，每个敌人只与光束矩形比较一次
+        for laser in player.lasers:
+            beam = laser.beam_rect
+            for cell, _ in self.terrain.query(beam, TILE_BRICK):
+                self._remove_brick(cell)
             
-            # 与砖块碰撞
-            for pos in self.brick_positions[:]:
-                if bullet_rect.colliderect(pygame.Rect(pos[0], pos[1], TILE_SIZE, TILE_SIZE)):
-                    self.brick_positions.remove(pos)
-                    self.player_tank.bullets.remove(bullet)
-                    if resources and 'bang' in resources.sounds:
-                        resources.sounds['bang'].play()
-                    break
-            else:
-                # 与铁墙碰撞
-                for pos in self.iron_positions:
-                    if bullet_rect.colliderect(pygame.Rect(pos[0], pos[1], TILE_SIZE, TILE_SIZE)):
-                        self.player_tank.bullets.remove(bullet)
-                        if resources and 'bang' in resources.sounds:
-                            resources.sounds['bang'].play()
-                        break
-                else:
-                    # 与敌人碰撞
-                    for enemy in self.enemy_tanks[:]:
-                        if bullet_rect.colliderect(enemy.get_rect()):
-                            damage = getattr(bullet, 'damage', 1)
-                            if enemy.take_damage(damage):
-                                self.enemy_tanks.remove(enemy)
-                                # 特殊敌人掉落道具
-                                if enemy.level == 'level4':
-                                    ptype = random.choice(['gun', 'shell', 'tank', 'star'])
-                                    self.powerups.append((enemy.x, enemy.y, ptype))
-                            self.player_tank.bullets.remove(bullet)
-                            if resources and 'bang' in resources.sounds:
-                                resources.sounds['bang'].play()
-                            break
-        
-        # 玩家激光碰撞检测
-        for laser in self.player_tank.lasers:
-            for rect in laser.get_collision_rects():
-                # 与砖块碰撞
-                for pos in self.brick_positions[:]:
-                    if rect.colliderect(pygame.Rect(pos[0], pos[1], TILE_SIZE, TILE_SIZE)):
-                        self.brick_positions.remove(pos)
-                
-                # 与敌人碰撞
-                for enemy in self.enemy_tanks[:]:
-                    if rect.colliderect(enemy.get_rect()):
-                        if enemy.take_damage(laser.damage):
-                            self.enemy_tanks.remove(enemy)
-                            if enemy.level == 'level4':
-                                ptype = random.choice(['gun', 'shell', 'tank', 'star'])
-                                self.powerups.append((enemy.x, enemy.y, ptype))
-        
-        # 敌人子弹碰撞检测
-        player_rect = self.player_tank.get_rect()
-        for enemy in self.enemy_tanks:
-            for bullet in enemy.bullets[:]:
-                bullet_rect = bullet.get_rect()
-                
-                # 与砖块碰撞
-                for pos in self.brick_positions[:]:
-                    if bullet_rect.colliderect(pygame.Rect(pos[0], pos[1], TILE_SIZE, TILE_SIZE)):
-                        self.brick_positions.remove(pos)
-                        enemy.bullets.remove(bullet)
-                        if resources and 'bang' in resources.sounds:
-                            resources.sounds['bang'].play()
-                        break
-                else:
-                    # 与铁墙碰撞
-                    for pos in self.iron_positions:
-                        if bullet_rect.colliderect(pygame.Rect(pos[0], pos[1], TILE_SIZE, TILE_SIZE)):
-                            enemy.bullets.remove(bullet)
-                            if resources and 'bang' in resources.sounds:
-                                resources.sounds['bang'].play()
-                            break
-                    else:
-                        # 与玩家碰撞
-                        if bullet_rect.colliderect(player_rect):
-                            enemy.bullets.remove(bullet)
-                            if self.player_tank.take_damage():
-                                return True  # 游戏结束
+            hits = [(laser.hit_order(enemy.get_rect()), enemy) for enemy in self._active_enemies_in(beam)]
+            hits.sort(key=lambda hit: hit[0])
+            for _, enemy in hits:
+                if enemy.take_damage(laser.damage):
+                    self._kill_enemy(enemy, enemies)
+        
+        # 敌人子弹碰撞检测（发射者已被摧毁的子弹已随之移除）
+        for bullet in enemy_bullets:
+            if bullet.slot < 0:
+                continue
+            hit, target = self._sweep_bullet(bullet, (player,))
+            if not hit:
+                continue
+            store.remove(bullet)
+            # 与砖块、铁墙碰撞
+            if target is None:
+                if resources and 'bang' in resources.sounds:
+                    resources.sounds['bang'].play()
+            # 与玩家碰撞
+            elif player.take_damage():
+                return True  # 游戏结束
         
         return False
     
-    def draw(self):
-        """绘制地图"""
-        # 绘制地形
-        for pos in self.brick_positions:
-            if resources and 'brick' in resources.images:
-                self.screen.blit(resources.images['brick'], pos)
+    def _draw_tile(self, surface, kind, pos):
+        """在图层上绘制一个砖块或铁墙格子"""
+        name, color = ('brick', (139, 69, 19)) if kind == TILE_BRICK else ('iron', (192, 192, 192))
+        if resources and name in resources.images:
+            surface.blit(resources.images[name], pos)
+        else:
+            pygame.draw.rect(surface, color, (pos[0], pos[1], TILE_SIZE, TILE_SIZE))
+    
+    def _draw_rivers(self, surface, chunk):
+        """在图层上绘制地形块中的所有河流（块内坐标）"""
+        for i, (pos, size) in enumerate(chunk.rivers):
+            if i < len(chunk.river_images):
+                surface.blit(chunk.river_images[i], pos)
             else:
-                pygame.draw.rect(self.screen, (139, 69, 19), (pos[0], pos[1], TILE_SIZE, TILE_SIZE))
+                pygame.draw.rect(surface, (0, 0, 255), (pos, size))
+    
+    def _render_chunk_layer(self, chunk):
+        """将地形块的静态地形（砖块、铁墙、河流）预渲染到离屏图层并放入缓存"""
+        layer = pygame.Surface((CHUNK_SIZE, CHUNK_SIZE))
+        layer.fill((0, 0, 0))
+        for kind in SOLID_TILES:
+            for pos in chunk.grid.positions(kind):
+                self._draw_tile(layer, kind, pos)
+        self._draw_rivers(layer, chunk)
+        chunk.grid.dirty_cells.clear()
+        
+        self.chunk_layers[(chunk.cx, chunk.cy)] = layer
+        if len(self.chunk_layers) > CHUNK_LAYER_CACHE:
+            self.chunk_layers.popitem(last=False)
+        return layer
+    
+    def _render_terrain_layers(self):
+        """预渲染摄像机视野内所有地形块的图层，使第一帧无需再渲染"""
+        self.camera.follow(*self.player_tank.get_rect().center)
+        for chunk in self.terrain.chunks_in_rect(self.camera.rect):
+            if (chunk.cx, chunk.cy) not in self.chunk_layers:
+                self._render_chunk_layer(chunk)
+    
+    def _redraw_terrain_cell(self, layer, chunk, cell):
+        """砖块被摧毁后只重绘地形块图层中对应的格子（块内坐标）"""
+        col, row = cell
+        rect = pygame.Rect(col * TILE_SIZE, row * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+        layer.fill((0, 0, 0), rect)
+        kind = chunk.grid.kind_at(col, row)
+        if kind in SOLID_TILES:
+            self._draw_tile(layer, kind, rect.topleft)
+        # 河流不与网格对齐，裁剪到该格子后重绘
+        layer.set_clip(rect)
+        self._draw_rivers(layer, chunk)
+        layer.set_clip(None)
+    
+    def _draw_trees(self, chunks, offset):
+        """绘制可见地形块中视野内的树木（覆盖在坦克之上）
+        
+        每块只有几棵树，逐棵贴图比贴一张覆盖所有树木的SRCALPHA图层快得多：
+        图层需要对整个并集矩形（通常接近整块）做alpha混合，而每棵树只混合60×70像素。
+        """
+        tree_image = resources.images.get('tree') if resources else None
+        view = self.camera.rect
+        for chunk in chunks:
+            for x, y in chunk.trees:
+                if not view.colliderect((x, y) + TREE_SIZE):
+                    continue
+                pos = (x - offset[0], y - offset[1])
+                if tree_image:
+                    self.screen.blit(tree_image, pos)
+                else:
+                    pygame.draw.rect(self.screen, (0, 128, 0), (pos[0], pos[1], 60, 70))
+    
+    def draw(self, alpha=1.0):
+        """绘制地图，返回本帧发生变化的区域列表（静态地形和树木除外）
         
-        for pos in self.iron_positions:
-            if resources and 'iron' in resources.images:
-                self.screen.blit(resources.images['iron'], pos)
-            else:
-                pygame.draw.rect(self.screen, (192, 192, 192), (pos[0], pos[1], TILE_SIZE, TILE_SIZE))
+        alpha为上一逻辑帧到当前逻辑帧之间的插值比例，1.0表示不插值。
+        """
+        rects = []
         
-        for i, (pos, _) in enumerate(self.river_positions):
-            if i < len(self.river_images):
-                self.screen.blit(self.river_images[i], pos)
+        # 摄像机跟随玩家；画面滚动时整屏都发生了变化
+        x, y = self.player_tank.render_pos(alpha)
+        self.camera.follow(x + TANK_SIZE / 2, y + TANK_SIZE / 2)
+        offset = self.camera.offset
+        if offset != self.last_camera_offset:
+            rects.append(self.screen.get_rect())
+            self.last_camera_offset = offset
+        
+        # 绘制地形：可见的每个地形块各贴一次预渲染图层，只增量重绘发生变化的格子
+        view = self.camera.rect
+        chunks = self.terrain.chunks_in_rect(view)
+        self.camera.canopy = [band for chunk in chunks for band in chunk.canopy if view.colliderect(band)]
+        for chunk in chunks:
+            key = (chunk.cx, chunk.cy)
+            layer = self.chunk_layers.get(key)
+            if layer is None:
+                layer = self._render_chunk_layer(chunk)
             else:
-                pygame.draw.rect(self.screen, (0, 0, 255), pos)
-        
-        # 绘制道具
+                self.chunk_layers.move_to_end(key)
+                for cell in chunk.grid.dirty_cells:
+                    self._redraw_terrain_cell(layer, chunk, cell)
+                    rects.append(pygame.Rect(chunk.rect.x + cell[0] * TILE_SIZE - offset[0],
+                                             chunk.rect.y + cell[1] * TILE_SIZE - offset[1],
+                                             TILE_SIZE, TILE_SIZE))
+                chunk.grid.dirty_cells.clear()
+            # 只贴图层中落在视野内的部分
+            area = chunk.rect.clip(view).move(-chunk.rect.x, -chunk.rect.y)
+            self.screen.blit(layer, (chunk.rect.x - offset[0] + area.x, chunk.rect.y - offset[1] + area.y), area)
+        
+        # 绘制道具（道具图片和无图片时的圆形标识都在 TANK_SIZE 见方的范围内）
         for x, y, ptype in self.powerups:
+            if not self.camera.sees(pygame.Rect(x, y, TANK_SIZE, TANK_SIZE)):
+                continue
+            x, y = x - offset[0], y - offset[1]
             if resources:
                 image_key = f'food_{ptype}'
                 if image_key in resources.images:
-                    self.screen.blit(resources.images[image_key], (x, y))
+                    rects.append(self.screen.blit(resources.images[image_key], (x, y)))
                 else:
                     # 绘制简单的道具标识
-                    pygame.draw.circle(self.screen, (255, 255, 0), (x + 25, y + 25), 20)
+                    rects.append(pygame.draw.circle(self.screen, (255, 255, 0), (x + 25, y + 25), 20))
                     text = self.screen.get_rect()  # 这里可以添加文字标识
             else:
-                pygame.draw.circle(self.screen, (255, 255, 0), (x + 25, y + 25), 20)
+                rects.append(pygame.draw.circle(self.screen, (255, 255, 0), (x + 25, y + 25), 20))
         
         # 绘制坦克
-        self.player_tank.draw()
+        rects += self.player_tank.draw(alpha, self.camera)
         for enemy in self.enemy_tanks:
-            enemy.draw()
+            rects += enemy.draw(alpha, self.camera)
+        rects += self.bullet_store.draw(self.screen, alpha, self.camera)
         
         # 绘制树木（最上层）
-        for pos in self.tree_positions:
-            if resources and 'tree' in resources.images:
-                self.screen.blit(resources.images['tree'], pos)
-            else:
-                pygame.draw.rect(self.screen, (0, 128, 0), (pos[0], pos[1], 60, 70))
+        self._draw_trees(chunks, offset)
+        
+        return rects
 
 # ==================== UI管理器 ====================
 class UIManager:
@@ -1005,6 +2217,21 @@ class UIManager:
         self.screen = screen
         self.font = pygame.font.SysFont("SimHei", 30)
         self.small_font = pygame.font.SysFont("SimHei", 20)
+        
+        # 文字缓存：(字体, 文本, 颜色) -> 渲染好的文字图片
+        self.text_cache = {}
+        # 状态栏只在玩家属性变化时重新渲染
+        self.status_key = None
+        self.status_surface = None
+    
+    def render_text(self, font, text, color):
+        """渲染文字，相同的 (字体, 文本, 颜色) 只渲染一次"""
+        key = (font, text, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.text_cache[key] = surface
+        return surface
     
     def draw_button(self, text, x, y, w, h, inactive_color, active_color):
         """绘制按钮"""
@@ -1019,7 +2246,7 @@ class UIManager:
         pygame.draw.rect(self.screen, color, button_rect, border_radius=8)
         
         # 绘制按钮文字
-        text_surface = self.font.render(text, True, (0, 0, 0))
+        text_surface = self.render_text(self.font, text, (0, 0, 0))
         text_rect = text_surface.get_rect(center=button_rect.center)
         self.screen.blit(text_surface, text_rect)
         
@@ -1030,12 +2257,12 @@ class UIManager:
         # 不在这里清屏，让主循环控制
         
         # 标题
-        title = self.font.render("坦克大战", True, (255, 255, 255))
+        title = self.render_text(self.font, "坦克大战", (255, 255, 255))
         title_rect = title.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 100))
         self.screen.blit(title, title_rect)
         
         # 说明文字
-        info_text = self.small_font.render("TAB切换射击模式 | 空格射击 | 方向键移动", True, (200, 200, 200))
+        info_text = self.render_text(self.small_font, "TAB切换射击模式 | 空格射击 | 方向键移动", (200, 200, 200))
         info_rect = info_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
         self.screen.blit(info_text, info_rect)
         
@@ -1048,21 +2275,27 @@ class UIManager:
                                (0, 200, 0), (0, 255, 0))
     
     def draw_game_ui(self, player_tank):
-        """绘制游戏UI"""
-        # 玩家状态
-        status_text = (f"生命: {player_tank.hp} | "
-                       f"弹速: {player_tank.bullet_speed} | "
-                       f"弹数: {player_tank.max_bullets} | "
-                       f"模式: {player_tank.shoot_mode.value}")
-        text_surface = self.small_font.render(status_text, True, (255, 255, 255))
-        self.screen.blit(text_surface, (10, 10))
+        """绘制游戏UI，返回绘制区域列表"""
+        # 玩家状态（属性未变化时复用上次渲染的文字）
+        status_key = (player_tank.hp, player_tank.bullet_speed,
+                      player_tank.max_bullets, player_tank.shoot_mode)
+        if status_key != self.status_key:
+            status_text = (f"生命: {player_tank.hp} | "
+                           f"弹速: {player_tank.bullet_speed} | "
+                           f"弹数: {player_tank.max_bullets} | "
+                           f"模式: {player_tank.shoot_mode.value}")
+            self.status_surface = self.small_font.render(status_text, True, (255, 255, 255))
+            self.status_key = status_key
+        rects = [self.screen.blit(self.status_surface, (10, 10))]
         
         # 蓄力条
         if player_tank.shoot_mode == ShootMode.CHARGED and player_tank.charging:
-            self._draw_charge_bar(player_tank.charge_power / player_tank.max_charge_power)
+            rects.append(self._draw_charge_bar(player_tank.charge_power / player_tank.max_charge_power))
+        
+        return rects
     
     def _draw_charge_bar(self, charge_rate):
-        """绘制蓄力条"""
+        """绘制蓄力条，返回绘制区域"""
         bar_width = 200
         bar_height = 20
         bar_x = (SCREEN_WIDTH - bar_width) // 2
@@ -1085,26 +2318,150 @@ class UIManager:
                         (bar_x, bar_y, progress_width, bar_height))
         
         # 边框
-        pygame.draw.rect(self.screen, (255, 255, 255), 
-                        (bar_x, bar_y, bar_width, bar_height), 2)
+        return pygame.draw.rect(self.screen, (255, 255, 255), 
+                               (bar_x, bar_y, bar_width, bar_height), 2)
     
     def draw_game_over(self):
         """绘制游戏结束画面"""
         self.screen.fill((0, 0, 0))
         
         if resources and 'gameover' in resources.images:
-            scaled_image = pygame.transform.scale(resources.images['gameover'], 
-                                                (SCREEN_WIDTH, SCREEN_HEIGHT))
+            scaled_image = resources.get_scaled('gameover', (SCREEN_WIDTH, SCREEN_HEIGHT))
             self.screen.blit(scaled_image, (0, 0))
 
-            hint = self.small_font.render("按任意键返回主菜单", True, (255, 255, 255))
+            hint = self.render_text(self.small_font, "按任意键返回主菜单", (255, 255, 255))
             hint_rect = hint.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
             self.screen.blit(hint, hint_rect)
 
+# ==================== 帧性能分析 ====================
+class FrameProfiler:
+    """帧性能分析器：按阶段统计每帧耗时，以叠加层显示
+    
+    各阶段结束时调用mark()，累加自上一次mark以来的时间；一帧结束时写入固定大小的环形缓冲区。
+    只统计整帧都处于游戏中的帧；关闭时主循环不调用任何方法。
+    """
+    PHASES = ('events', 'input', 'bullets', 'ai', 'powerups', 'collisions', 'draw', 'hud', 'flip', 'idle')
+    PHASE_NAMES = {
+        'events': '事件处理', 'input': '玩家输入', 'bullets': '子弹移动', 'ai': '敌人AI',
+        'powerups': '道具', 'collisions': '碰撞检测', 'draw': '地图绘制', 'hud': '界面',
+        'flip': '刷新显示', 'idle': '等待',
+    }
+    PHASE_COLORS = {
+        'events': (200, 200, 200), 'input': (0, 200, 255), 'bullets': (0, 120, 255),
+        'ai': (255, 160, 0), 'powerups': (255, 120, 200), 'collisions': (255, 60, 60),
+        'draw': (0, 220, 0), 'hud': (200, 0, 255), 'flip': (255, 255, 0), 'idle': (80, 80, 80),
+    }
+    GRAPH_HEIGHT = 80
+    
+    def __init__(self, font, fps=FPS):
+        self.font = font
+        self.enabled = False
+        # 每帧的帧时间预算（毫秒），图表以它的两倍为满刻度
+        self.budget = 1000 / fps if fps else 1000 / FPS
+        self.phase_index = {phase: i for i, phase in enumerate(self.PHASES)}
+        
+        # 环形缓冲区：每行一帧，每列一个阶段的耗时（毫秒）
+        self.samples = np.zeros((PROFILER_FRAMES, len(self.PHASES)))
+        self.index = 0
+        self.count = 0
+        self.current = [0.0] * len(self.PHASES)
+        self.last = 0.0
+        
+        # 叠加层每隔PROFILER_REFRESH帧重新渲染，其余帧直接贴图
+        self.surface = None
+        self.frames_since_render = 0
+    
+    def toggle(self):
+        """开关分析器，重新开启时清空历史数据"""
+        self.enabled = not self.enabled
+        self.index = 0
+        self.count = 0
+        self.current = [0.0] * len(self.PHASES)
+        self.surface = None
+    
+    def begin_frame(self):
+        """开始一帧的计时，丢弃未结束的上一帧"""
+        self.current = [0.0] * len(self.PHASES)
+        self.last = time.perf_counter()
+    
+    def mark(self, phase):
+        """将自上一次mark以来的时间计入指定阶段"""
+        now = time.perf_counter()
+        self.current[self.phase_index[phase]] += now - self.last
+        self.last = now
+    
+    def end_frame(self):
+        """结束一帧：剩余时间计为等待，写入环形缓冲区"""
+        self.mark('idle')
+        self.samples[self.index] = self.current
+        self.samples[self.index] *= 1000
+        self.index = (self.index + 1) % PROFILER_FRAMES
+        self.count = min(self.count + 1, PROFILER_FRAMES)
+        self.current = [0.0] * len(self.PHASES)
+    
+    def history(self):
+        """按时间顺序返回缓冲区中的帧数据"""
+        if self.count < PROFILER_FRAMES:
+            return self.samples[:self.count]
+        return np.roll(self.samples, -self.index, axis=0)
+    
+    def draw(self, screen, map_manager=None):
+        """绘制叠加层，返回绘制区域"""
+        self.frames_since_render += 1
+        if self.surface is None or self.frames_since_render >= PROFILER_REFRESH:
+            self._render(map_manager)
+            self.frames_since_render = 0
+        return screen.blit(self.surface, (10, 60))
+    
+    def _render(self, map_manager):
+        """统计最小/平均/p99耗时并渲染文字和帧时间图"""
+        data = self.history()
+        lines = []
+        if len(data):
+            totals = data.sum(axis=1)
+            avg = totals.mean()
+            lines.append((f"帧耗时 最小 {totals.min():.2f} / 平均 {avg:.2f} / "
+                          f"p99 {np.percentile(totals, 99):.2f} ms  ({1000 / avg:.0f} FPS)",
+                          (255, 255, 255)))
+            for phase in self.PHASES:
+                column = data[:, self.phase_index[phase]]
+                lines.append((f"{self.PHASE_NAMES[phase]}  平均 {column.mean():.2f}  "
+                              f"p99 {np.percentile(column, 99):.2f} ms", self.PHASE_COLORS[phase]))
+        if map_manager:
+            bullets = len(map_manager.bullet_store)
+            bricks = map_manager.terrain.count(TILE_BRICK)
+            lines.append((f"敌人 {len(map_manager.enemy_tanks)}  子弹 {bullets}  "
+                          f"激光 {len(map_manager.player_tank.lasers)}  砖块 {bricks}", (255, 255, 255)))
+        
+        texts = [self.font.render(text, True, color) for text, color in lines]
+        width = max([PROFILER_FRAMES] + [t.get_width() for t in texts]) + 20
+        height = sum(t.get_height() for t in texts) + self.GRAPH_HEIGHT + 30
+        self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.surface.fill((0, 0, 0, 180))
+        y = 10
+        for text in texts:
+            self.surface.blit(text, (10, y))
+            y += text.get_height()
+        
+        # 帧时间图：每帧一列，按阶段堆叠（不含等待），满刻度为两倍帧预算
+        graph_bottom = y + 10 + self.GRAPH_HEIGHT
+        scale = self.GRAPH_HEIGHT / (self.budget * 2)
+        for x, frame in enumerate(data):
+            top = graph_bottom
+            for phase in self.PHASES[:-1]:
+                h = frame[self.phase_index[phase]] * scale
+                if h >= 0.5:
+                    pygame.draw.line(self.surface, self.PHASE_COLORS[phase],
+                                     (10 + x, top), (10 + x, max(top - h, graph_bottom - self.GRAPH_HEIGHT)))
+                    top -= h
+        budget_y = graph_bottom - self.budget * scale
+        pygame.draw.line(self.surface, (255, 255, 255), (10, budget_y), (10 + PROFILER_FRAMES, budget_y))
+
 # ==================== 主游戏类 ====================
 class TankBattle:
     """主游戏类"""
-    def __init__(self):
+    def __init__(self, dirty_rects=False, tick_rate=TICK_RATE, fps=FPS, interpolate=False, seed=None,
+                 record_path=None, map_pool=None, world_chunks=1):
         pygame.init()
         pygame.mixer.init()
         
@@ -1115,13 +2472,31 @@ class TankBattle:
         
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("坦克大战")
+        resources.prepare_for_display()
         
         self.clock = pygame.time.Clock()
         self.game_state = GameState.MENU
         print("游戏状态初始化为菜单")
         
+        # 脏矩形模式：只把本帧和上一帧发生变化的区域提交到显示器
+        self.dirty_rects = dirty_rects
+        self.last_dirty_rects = None
+        
+        # 固定步长：逻辑帧率与渲染帧率（0表示不限制）相互独立，可选在逻辑帧之间插值绘制
+        self.tick_rate = tick_rate
+        self.fps = fps
+        self.interpolate = interpolate
+        
+        # 随机种子：每局的种子由主种子依次派生，相同主种子和相同输入得到完全相同的对局
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.seed_rng = random.Random(self.seed)
+        self.match_seed = None
+        print(f"随机种子: {self.seed}")
+        
         # 初始化管理器
         self.ui_manager = UIManager(self.screen)
+        # 帧性能分析叠加层（F3切换）
+        self.profiler = FrameProfiler(self.ui_manager.small_font, fps)
         self.map_manager = None
         
         # 输入状态
@@ -1131,18 +2506,57 @@ class TankBattle:
             Direction.LEFT: False,
             Direction.RIGHT: False,
         }
+        # 自上一逻辑帧以来发生的按键事件，在下一逻辑帧开始时统一处理
+        self.input_events = {'switch_mode': False, 'fire_pressed': False, 'fire_released': False}
+        
+        # 输入录制：每局的逐帧输入连同本局种子写入录像文件
+        self.record_path = record_path
+        self.recorder = None
+        self.recorded_matches = 0
+        
+        # 预生成的地图池（可选）
+        self.map_pool = map_pool
+        # 世界边长（地形块数），大于1时为摄像机跟随玩家的大地图
+        self.world_chunks = world_chunks
+        
+        # 下一局在后台线程中提前生成：(种子, Future)，开始游戏时直接取用
+        self.pregen_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pregen")
+        self.next_match = None
+        self._prepare_next_match()
 
         print("游戏初始化完成，准备开始主循环")
     
     def run(self):
-        """运行游戏主循环"""
+        """运行游戏主循环
+        
+        逻辑以固定步长推进：每帧把经过的时间累加到accumulator，按tick_rate执行
+        若干次逻辑更新，卡顿或高刷新率都不会改变游戏速度。
+        """
         running = True
+        tick_interval = 1.0 / self.tick_rate
+        accumulator = 0.0
+        previous_time = time.perf_counter()
         
         while running:
+            current_time = time.perf_counter()
+            accumulator += min(current_time - previous_time, MAX_FRAME_TIME)
+            previous_time = current_time
+            
+            # 分析器关闭或不在游戏中时本帧不做任何计时
+            profiler = self.profiler if self.profiler.enabled and self.game_state == GameState.GAME else None
+            if profiler:
+                profiler.begin_frame()
+            if self.map_manager:
+                self.map_manager.profiler = profiler
+            
             # 处理事件
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
+                    self._finish_recording()
+                
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self.profiler.toggle()
                 
                 if self.game_state == GameState.GAME:
                     self._handle_game_events(event)
@@ -1150,21 +2564,36 @@ class TankBattle:
                     if event.type == pygame.KEYDOWN:
                         self.screen.fill((0, 0, 0))
                         self.game_state = GameState.MENU
+            if profiler:
+                profiler.mark('events')
             
-            # 更新游戏状态
+            # 更新游戏状态（游戏中按固定步长执行逻辑帧）
             if self.game_state == GameState.MENU:
                 self._update_menu()
+                accumulator = 0.0
             elif self.game_state == GameState.GAME:
-                self._update_game()
+                while accumulator >= tick_interval and self.game_state == GameState.GAME:
+                    self._update_game()
+                    accumulator -= tick_interval
             elif self.game_state == GameState.GAMEOVER:
                 self._update_gameover()
+                accumulator = 0.0
+            
+            # 本帧离开了游戏状态（返回菜单或游戏结束）时丢弃本帧的计时
+            if profiler and self.game_state != GameState.GAME:
+                profiler = None
+                self.map_manager.profiler = None
             
             # 绘制
-            self._draw()
+            alpha = accumulator / tick_interval if self.interpolate else 1.0
+            self._draw(alpha, profiler)
             
-            # 控制帧率
-            self.clock.tick(FPS)
+            # 控制渲染帧率
+            self.clock.tick(self.fps)
+            if profiler:
+                profiler.end_frame()
         
+        self.pregen_executor.shutdown(cancel_futures=True)
         pygame.quit()
         sys.exit()
     
@@ -1173,28 +2602,64 @@ class TankBattle:
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_ESCAPE:
                 self.game_state = GameState.MENU
+                self._finish_recording()
             elif event.key == pygame.K_TAB:
                 # 切换射击模式
-                self.map_manager.player_tank.switch_shoot_mode()
+                self.input_events['switch_mode'] = True
             elif event.key == pygame.K_SPACE:
-                tank = self.map_manager.player_tank
-                if tank.shoot_mode == ShootMode.CHARGED:
-                    tank.start_charging()
-                else:
-                    tank.shoot()
+                # 射击或开始蓄力
+                self.input_events['fire_pressed'] = True
         
         elif event.type == pygame.KEYUP:
             if event.key == pygame.K_SPACE:
-                tank = self.map_manager.player_tank
-                if tank.shoot_mode == ShootMode.CHARGED:
-                    tank.release_charge()
+                # 释放蓄力
+                self.input_events['fire_released'] = True
     
     def _update_menu(self):
         """更新菜单状态"""
         # 绘制菜单并检查按钮点击
         if self.ui_manager.draw_main_menu():
             self.game_state = GameState.GAME
-            self.map_manager = MapManager(self.screen)
+            self._start_match()
+    
+    def _start_match(self):
+        """开始后台已准备好的一局游戏，并立即开始准备下一局"""
+        self.match_seed, future = self.next_match
+        print(f"本局种子: {self.match_seed}")
+        self.map_manager = future.result()
+        # 上一局最后一帧锁存的按键事件不带入新的一局
+        self.input_events = {'switch_mode': False, 'fire_pressed': False, 'fire_released': False}
+        if self.record_path:
+            pool = self.map_pool.identity() if self.map_pool is not None else None
+            self.recorder = InputRecorder(self.match_seed, self.world_chunks, pool)
+        self._prepare_next_match()
+    
+    def _prepare_next_match(self):
+        """派生下一局的种子，在后台线程中生成地图
+        
+        种子仍按对局顺序在主线程中派生，同一个主种子得到的对局序列不变。
+        """
+        seed = self.seed_rng.randrange(2 ** 32)
+        self.next_match = (seed, self.pregen_executor.submit(self._build_match, seed))
+    
+    def _build_match(self, seed):
+        """生成地图、玩家和敌人，并预渲染地形图层，使第一帧无需再做准备"""
+        map_manager = MapManager(self.screen, random.Random(seed), self.map_pool, self.world_chunks)
+        map_manager._render_terrain_layers()
+        return map_manager
+    
+    def _finish_recording(self):
+        """保存当前对局的录像（第二局起在文件名后加序号）"""
+        if self.recorder is None:
+            return
+        self.recorded_matches += 1
+        path = self.record_path
+        if self.recorded_matches > 1:
+            root, ext = os.path.splitext(path)
+            path = f"{root}_{self.recorded_matches}{ext}"
+        self.recorder.save(path)
+        print(f"录像已保存: {path}（{len(self.recorder.frames)}帧）")
+        self.recorder = None
     
     def _update_game(self):
         """更新游戏状态"""
@@ -1212,41 +2677,200 @@ class TankBattle:
                 direction = dir
                 break
         
-        # 移动玩家坦克
-        barriers = self.map_manager.get_barriers()
-        self.map_manager.player_tank.move(direction, barriers)
-        
-        # 更新蓄力
-        self.map_manager.player_tank.update_charge()
+        # 取出自上一逻辑帧以来的按键事件
+        events = self.input_events
+        self.input_events = {'switch_mode': False, 'fire_pressed': False, 'fire_released': False}
+        if self.recorder:
+            self.recorder.record(DIRECTIONS.index(direction), **events)
         
-        # 更新地图
-        if self.map_manager.update():
+        # 处理输入、移动玩家坦克、更新蓄力并更新地图
+        if self.map_manager.tick(direction, **events):
             self.game_state = GameState.GAMEOVER
+            self._finish_recording()
     
     def _update_gameover(self):
         """更新游戏结束状态"""
         pass
     
-    def _draw(self):
+    def _draw(self, alpha=1.0, profiler=None):
         """绘制游戏画面"""
-        # 总是先清屏
-        if not self.game_state == GameState.MENU:
-            self.screen.fill((0, 0, 0))
-        
+        # 游戏中由地形图层覆盖整个屏幕，游戏结束画面自行清屏，无需再单独清屏
+        dirty = None
         if self.game_state == GameState.MENU:
             # 菜单状态下不需要额外绘制，_update_menu会处理
             # 事实上 没有绘制
             pass # 
         elif self.game_state == GameState.GAME:
-            self.map_manager.draw()
-            self.ui_manager.draw_game_ui(self.map_manager.player_tank)
+            dirty = self.map_manager.draw(alpha)
+            if profiler:
+                profiler.mark('draw')
+            dirty += self.ui_manager.draw_game_ui(self.map_manager.player_tank)
+            # 分析叠加层的绘制计入界面耗时
+            if profiler:
+                dirty.append(profiler.draw(self.screen, self.map_manager))
+                profiler.mark('hud')
         elif self.game_state == GameState.GAMEOVER:
             self.ui_manager.draw_game_over()
         
-        pygame.display.flip()
+        self._present(dirty)
+        if profiler:
+            profiler.mark('flip')
+    
+    def _present(self, dirty):
+        """将画面提交到显示器
+        
+        脏矩形模式下只更新本帧和上一帧的变化区域（上一帧的区域需要擦除），
+        菜单、结束画面、状态切换后的首帧或变化面积过大时退回整屏刷新。
+        """
+        if not self.dirty_rects or dirty is None or self.last_dirty_rects is None:
+            pygame.display.flip()
+        else:
+            screen_rect = self.screen.get_rect()
+            rects = [rect.clip(screen_rect) for rect in dirty + self.last_dirty_rects]
+            area = sum(rect.width * rect.height for rect in rects)
+            if area > SCREEN_WIDTH * SCREEN_HEIGHT * DIRTY_AREA_LIMIT:
+                pygame.display.flip()
+            else:
+                pygame.display.update(rects)
+        self.last_dirty_rects = dirty
+
+# ==================== 无窗口模拟 ====================
+def _init_headless():
+    """使用SDL虚拟驱动初始化pygame，不创建窗口也不打开音频设备"""
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    pygame.init()
+
+def run_headless(ticks, seed=None, map_pool=None, world_chunks=1):
+    """无窗口模式：不绘制、不限帧，尽可能快地运行指定数量的逻辑帧并统计每秒帧数"""
+    _init_headless()
+    
+    # 每局种子由主种子依次派生，保证同一种子的测试负载完全相同
+    seed = seed if seed is not None else random.randrange(2 ** 32)
+    seed_rng = random.Random(seed)
+    
+    # 不创建ResourceManager，跳过图片解码；所有对象在resources为None时走无图片分支
+    map_manager = MapManager(None, random.Random(seed_rng.randrange(2 ** 32)), map_pool, world_chunks)
+    matches = 1
+    
+    start = time.perf_counter()
+    for _ in range(ticks):
+        # 玩家原地不动并持续开火，以覆盖子弹碰撞逻辑
+        if map_manager.tick(Direction.STOP, fire_pressed=True):
+            # 一局结束后立即开始新的一局，保证跑满指定帧数
+            map_manager = MapManager(None, random.Random(seed_rng.randrange(2 ** 32)), map_pool, world_chunks)
+            matches += 1
+    elapsed = time.perf_counter() - start
+    
+    print(f"随机种子: {seed} | 逻辑帧数: {ticks} | 对局数: {matches} | 耗时: {elapsed:.3f}s | "
+          f"每秒帧数: {ticks / elapsed:.1f}")
+    pygame.quit()
+    return ticks / elapsed
+
+def check_replay(path, map_pool=None, world_chunks=None):
+    """读取录像并核对对局设置，返回 (随机种子, 世界大小, 逐帧输入字节)
+    
+    世界大小取自录像头部，world_chunks不为None时必须与之相同；录制时使用了地图池的录像
+    必须提供同一个地图池（按地图数和第一张地图的种子核对）。不一致时抛出ValueError，
+    不会用不同的地形回放出另一局游戏。
+    """
+    seed, recorded_chunks, pool, frames = load_replay(path)
+    if world_chunks is not None and world_chunks != recorded_chunks:
+        raise ValueError(f"录像的世界大小为 {recorded_chunks}×{recorded_chunks} 个地形块，"
+                         f"与 --world-chunks {world_chunks} 不一致")
+    current = map_pool.identity() if map_pool is not None else None
+    if current != pool:
+        if pool is None:
+            raise ValueError("录像录制时未使用地图池，回放时不能指定 --map-pool")
+        if current is None:
+            raise ValueError(f"录像录制时使用了地图池（{pool[0]}张地图，第一张种子 {pool[1]}），"
+                             f"回放时需要用 --map-pool 指定同一个地图池")
+        raise ValueError(f"地图池与录像不一致：录像为 {pool[0]} 张地图、第一张种子 {pool[1]}，"
+                         f"当前为 {current[0]} 张地图、第一张种子 {current[1]}")
+    return seed, recorded_chunks, frames
+
+def run_replay(seed, frames, map_pool=None, world_chunks=1):
+    """无窗口回放录像：用录像中的种子重建对局，逐帧输入录制的按键，不限帧运行并统计每秒帧数
+    
+    参数由check_replay读取并核对。
+    """
+    _init_headless()
+    
+    map_manager = MapManager(None, random.Random(seed), map_pool, world_chunks)
+    ticks = 0
+    game_over = False
+    
+    start = time.perf_counter()
+    for value in frames:
+        direction_index, switch_mode, fire_pressed, fire_released = decode_input(value)
+        ticks += 1
+        if map_manager.tick(DIRECTIONS[direction_index], switch_mode, fire_pressed, fire_released):
+            game_over = True
+            break
+    elapsed = time.perf_counter() - start
+    
+    print(f"回放种子: {seed} | 逻辑帧数: {ticks}/{len(frames)} | "
+          f"结果: {'对局结束' if game_over else '未结束'} | 玩家生命: {map_manager.player_tank.hp} | "
+          f"剩余敌人: {len(map_manager.enemy_tanks)} | 耗时: {elapsed:.3f}s | "
+          f"每秒帧数: {ticks / elapsed:.1f}")
+    pygame.quit()
+    return ticks / elapsed
 
 # ==================== 程序入口 ====================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="坦克大战")
+    parser.add_argument("--headless", type=int, metavar="TICKS",
+                        help="无窗口模式：不限帧运行指定数量的逻辑帧并输出每秒帧数")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="脏矩形模式：只刷新发生变化的屏幕区域，适合低性能设备")
+    parser.add_argument("--tick-rate", type=int, default=TICK_RATE,
+                        help=f"逻辑帧率（默认{TICK_RATE}）")
+    parser.add_argument("--fps", type=int, default=FPS,
+                        help=f"渲染帧率上限，0表示不限制（默认{FPS}）")
+    parser.add_argument("--interpolate", action="store_true",
+                        help="在两个逻辑帧之间插值绘制坦克和子弹位置")
+    parser.add_argument("--seed", type=int,
+                        help="随机种子，相同种子和相同输入得到完全相同的游戏（默认随机）")
+    parser.add_argument("--record", metavar="FILE",
+                        help="录制每局的逐帧输入到录像文件")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="无窗口回放录像文件并输出每秒帧数")
+    parser.add_argument("--map-pool", metavar="FILE",
+                        help="从 map_pool.py 预生成的地图池中取地图，不再逐局生成")
+    parser.add_argument("--world-chunks", type=int, metavar="N",
+                        help=f"大地图：世界由N×N个{CHUNK_SIZE}像素的地形块组成，摄像机跟随玩家"
+                             f"（默认1，回放时默认使用录像中的设置）")
+    args = parser.parse_args()
+    if args.tick_rate <= 0:
+        parser.error("逻辑帧率必须为正整数")
+    if args.headless is not None and args.headless <= 0:
+        parser.error("无窗口模拟的帧数必须为正整数")
+    if args.world_chunks is not None and args.world_chunks < 1:
+        parser.error("世界地形块数必须为正整数")
+    
+    map_pool = None
+    if args.map_pool:
+        if MapPool is None:
+            parser.error("无法导入地图池模块，不能使用地图池")
+        try:
+            map_pool = MapPool(args.map_pool)
+        except ValueError as e:
+            parser.error(str(e))
+        if (map_pool.width, map_pool.height) != (CHUNK_SIZE, CHUNK_SIZE):
+            parser.error(f"地图池尺寸 {map_pool.width}x{map_pool.height} 与地形块尺寸不一致")
+    
+    if args.replay:
+        try:
+            seed, world_chunks, frames = check_replay(args.replay, map_pool, args.world_chunks)
+        except ValueError as e:
+            parser.error(str(e))
+        run_replay(seed, frames, map_pool, world_chunks)
+        sys.exit()
+    world_chunks = args.world_chunks if args.world_chunks is not None else 1
+    if args.headless is not None:
+        run_headless(args.headless, args.seed, map_pool, world_chunks)
+        sys.exit()
+    
     try:
         print("正在启动坦克大战...")
         print(f"Python版本: {sys.version}")
@@ -1260,7 +2884,9 @@ if __name__ == "__main__":
         
         # 启动游戏
         print("正在启动游戏...")
-        game = TankBattle()
+        game = TankBattle(dirty_rects=args.dirty_rects, tick_rate=args.tick_rate,
+                          fps=args.fps, interpolate=args.interpolate, seed=args.seed,
+                          record_path=args.record, map_pool=map_pool, world_chunks=world_chunks)
         game.run()
     except Exception as e:
         print(f"游戏启动失败: {e}")
@@ -2,8 +2,25 @@ import numpy as np
 import random
 from typing import Tuple, List
 
-def generate_blocks(map_width, map_height) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]], List[Tuple[int, int]], List[Tuple[Tuple[int, int], Tuple[int, int]]]]:
+# 瓦片类型（瓦片地图中的uint8取值）
+TILE_EMPTY = 0
+TILE_BRICK = 1
+TILE_IRON = 2
+TILE_TREE = 3
+TILE_RIVER = 4
+# 阻挡坦克和子弹的瓦片类型
+SOLID_TILES = (TILE_BRICK, TILE_IRON)
+
+def generate_blocks(map_width, map_height, rng: random.Random = None) -> Tuple[np.ndarray, List[Tuple[int, int]], List[Tuple[Tuple[int, int], Tuple[int, int]]]]:
+    """生成地图，返回 (瓦片地图, 树木坐标列表, 河流区域列表)
+
+    瓦片地图为 (行, 列) 的uint8数组，tiles[y // 24, x // 24] 为对应格子的 TILE_* 类型；
+    树木和河流不与网格对齐，额外返回其像素位置用于绘制。
+    所有随机数都取自rng，传入相同种子的随机数生成器即可得到相同的地图。
+    """
     width, height = map_width, map_height
+    if rng is None:
+        rng = random.Random()
         
     occupied = np.zeros((height, width), dtype=bool)
     
@@ -19,60 +36,75 @@ def generate_blocks(map_width, map_height) -> Tuple[List[Tuple[int, int]], List[
     grid_size = 24
     grid_cols = width // grid_size
     grid_rows = height // grid_size
-    grid_positions = [(i * grid_size, j * grid_size) 
-                     for i in range(grid_cols) for j in range(grid_rows)]
-    random.shuffle(grid_positions)
+    tiles = np.zeros((grid_rows, grid_cols), dtype=np.uint8)
+    
+    # 空闲格子池：pool保存空闲格子编号（行 * 列数 + 列），slot[格子]为其在pool中的下标，
+    # 已占用为-1。取出格子时与末尾元素交换后弹出，查询和取出都是O(1)
+    pool = list(range(grid_rows * grid_cols))
+    slot = list(range(grid_rows * grid_cols))
+    
+    def take(cell: int):
+        i = slot[cell]
+        last = pool.pop()
+        if last != cell:
+            pool[i] = last
+            slot[last] = i
+        slot[cell] = -1
+    
+    def free_neighbors(cell: int) -> List[int]:
+        row, col = divmod(cell, grid_cols)
+        neighbors = []
+        if col + 1 < grid_cols:
+            neighbors.append(cell + 1)
+        if col > 0:
+            neighbors.append(cell - 1)
+        if row + 1 < grid_rows:
+            neighbors.append(cell + grid_cols)
+        if row > 0:
+            neighbors.append(cell - grid_cols)
+        return [n for n in neighbors if slot[n] >= 0]
     
-    # 生成2-4个相邻块组成的图形
-    def generate_cluster(positions: list, max_blocks: int) -> List[Tuple[int, int]]:
+    # 生成2-4个相邻块组成的图形，格子取自共享的空闲池
+    def generate_cluster(max_blocks: int) -> List[int]:
         blocks = []
-        while len(blocks) < max_blocks and len(positions) > 1:
-            size = random.randint(2, 4)
-            start_idx = random.randint(0, len(positions) - 1)
-            start_x, start_y = positions.pop(start_idx)
-            cluster = [(start_x, start_y)]
-            
-            directions = [(grid_size, 0), (-grid_size, 0), 
-                         (0, grid_size), (0, -grid_size)]
+        while len(blocks) < max_blocks and len(pool) > 1:
+            size = rng.randint(2, 4)
+            start = pool[rng.randint(0, len(pool) - 1)]
+            take(start)
+            cluster = [start]
             
             for _ in range(size - 1):
                 added = False
-                random.shuffle(cluster)
-                for cx, cy in cluster:
-                    random.shuffle(directions)
-                    for dx, dy in directions:
-                        nx, ny = cx + dx, cy + dy
-                        if (nx, ny) in positions and 0 <= nx <= width-grid_size and 0 <= ny <= height-grid_size:
-                            idx = positions.index((nx, ny))
-                            positions.pop(idx)
-                            cluster.append((nx, ny))
-                            added = True
-                            break
-                    if added:
+                rng.shuffle(cluster)
+                for cell in cluster:
+                    neighbors = free_neighbors(cell)
+                    if neighbors:
+                        neighbor = rng.choice(neighbors)
+                        take(neighbor)
+                        cluster.append(neighbor)
+                        added = True
                         break
                 if not added:
                     break
             blocks.extend(cluster)
-            if len(blocks) >= max_blocks:
-                break
         return blocks[:max_blocks]  # 确保不超过最大数量
     
-    # 生成类型1和类型2块 (各60个)
-    type1_blocks = generate_cluster(grid_positions.copy(), 60)
-    type2_blocks = generate_cluster(grid_positions.copy(), 60)
+    # 砖块和铁墙从同一个空闲池中取格子，两者不会重叠
+    for tile in (TILE_BRICK, TILE_IRON):
+        tiles.flat[generate_cluster(60)] = tile
     
     # 标记占用
-    for blocks in [type1_blocks, type2_blocks]:
-        for x, y in blocks:
-            mark_occupied(x, y, grid_size, grid_size)
+    for cell in np.flatnonzero(tiles):
+        row, col = divmod(int(cell), grid_cols)
+        occupied[row * grid_size:(row + 1) * grid_size, col * grid_size:(col + 1) * grid_size] = True
     
     # 生成类型3块 (5个)
     type3_blocks = []
     for _ in range(5):
         placed = False
         for _ in range(100):  # 最多重试100次
-            x = random.randint(0, width - 60)
-            y = random.randint(0, height - 70)
+            x = rng.randint(0, width - 60)
+            y = rng.randint(0, height - 70)
             if mark_occupied(x, y, 60, 70):
                 type3_blocks.append((x, y))
                 placed = True
@@ -103,11 +135,11 @@ def generate_blocks(map_width, map_height) -> Tuple[List[Tuple[int, int]], List[
     for _ in range(2):
         placed = False
         for attempt in range(100):  # 最多重试100次
-            shape_idx = random.randint(0, 3)
-            x = random.randint(0, width - 300)
-            y = random.randint(0, height - 300)
-            seg1_len = random.randint(150, 300)
-            seg2_len = random.randint(150, 300)
+            shape_idx = rng.randint(0, 3)
+            x = rng.randint(0, width - 300)
+            y = rng.randint(0, height - 300)
+            seg1_len = rng.randint(150, 300)
+            seg2_len = rng.randint(150, 300)
             
             shape_func = river_shapes[shape_idx]
             segments = shape_func(x, y)
@@ -144,7 +176,15 @@ def generate_blocks(map_width, map_height) -> Tuple[List[Tuple[int, int]], List[
             if not placed:  # 如果所有角落都失败，放在左上角
                 river_list.append(((0, 0), (200, 20)))
     
-    return type1_blocks, type2_blocks, type3_blocks, river_list
+    # 将树木和河流覆盖到的空格子写入瓦片地图
+    for tile, areas in [(TILE_TREE, [((x, y), (60, 70)) for x, y in type3_blocks]),
+                        (TILE_RIVER, river_list)]:
+        for (x, y), (w, h) in areas:
+            cells = tiles[y // grid_size:(y + h - 1) // grid_size + 1,
+                          x // grid_size:(x + w - 1) // grid_size + 1]
+            cells[cells == TILE_EMPTY] = tile
+    
+    return tiles, type3_blocks, river_list
 
 
 
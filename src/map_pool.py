@@ -0,0 +1,116 @@
+"""预生成地图池
+
+批量生成地图并保存为一个结构化数组的 .npy 文件，游戏启动时以内存映射方式打开，
+按下标或种子直接取出一张地图，无需再运行 generate_blocks。
+
+用法:
+    python map_pool.py maps.npy --count 5000             # 用所有CPU核心生成5000张地图
+    python main.py --map-pool maps.npy                   # 游戏从地图池中取地图
+"""
+import argparse
+import os
+import random
+import time
+from multiprocessing import Pool
+from typing import List, Tuple
+
+import numpy as np
+
+from map import generate_blocks
+
+GRID_SIZE = 24
+# 每张地图的树木数量和河流段数上限（两个河流区域，每个最多两段）
+MAX_TREES = 5
+MAX_RIVER_SEGMENTS = 4
+
+
+def pool_dtype(width: int, height: int) -> np.dtype:
+    """地图池的记录类型：一条记录保存一张地图"""
+    return np.dtype([
+        ('seed', '<u8'),
+        ('tiles', 'u1', (height // GRID_SIZE, width // GRID_SIZE)),
+        ('trees', '<i4', (MAX_TREES, 2)),
+        ('tree_count', 'u1'),
+        ('rivers', '<i4', (MAX_RIVER_SEGMENTS, 4)),
+        ('river_count', 'u1'),
+    ])
+
+
+def _generate(args: Tuple[int, int, int]) -> np.ndarray:
+    """进程池任务：用指定种子生成一张地图并打包为一条记录"""
+    seed, width, height = args
+    tiles, trees, rivers = generate_blocks(width, height, random.Random(seed))
+    record = np.zeros((), dtype=pool_dtype(width, height))
+    record['seed'] = seed
+    record['tiles'] = tiles
+    record['trees'][:len(trees)] = trees
+    record['tree_count'] = len(trees)
+    record['rivers'][:len(rivers)] = [(x, y, w, h) for (x, y), (w, h) in rivers]
+    record['river_count'] = len(rivers)
+    return record
+
+
+def build_pool(path: str, count: int, width: int, height: int, seed: int = 0, workers: int = None):
+    """用进程池并行生成count张地图，第i张地图的种子为seed + i，直接写入内存映射的 .npy 文件"""
+    maps = np.lib.format.open_memmap(path, mode='w+', dtype=pool_dtype(width, height), shape=(count,))
+    tasks = [(seed + i, width, height) for i in range(count)]
+    with Pool(workers) as pool:
+        for i, record in enumerate(pool.imap(_generate, tasks, chunksize=64)):
+            maps[i] = record
+    maps.flush()
+    del maps
+
+
+class MapPool:
+    """以内存映射方式打开的地图池，只有被取用的地图才会读入内存"""
+    def __init__(self, path: str):
+        self.path = path
+        self.maps = np.load(path, mmap_mode='r')
+        if len(self.maps) == 0:
+            raise ValueError(f"地图池为空: {path}")
+        rows, cols = self.maps.dtype['tiles'].shape
+        self.width = cols * GRID_SIZE
+        self.height = rows * GRID_SIZE
+
+    def __len__(self):
+        return len(self.maps)
+
+    def identity(self) -> Tuple[int, int]:
+        """地图池的标识 (地图数, 第一张地图的种子)，写入录像以便回放时核对"""
+        return len(self.maps), int(self.maps[0]['seed'])
+
+    def layout(self, index: int) -> Tuple[np.ndarray, List[Tuple[int, int]], List[Tuple[Tuple[int, int], Tuple[int, int]]]]:
+        """按下标取出一张地图，返回值与 generate_blocks 相同（瓦片地图为可修改的副本）"""
+        record = self.maps[index % len(self.maps)]
+        tiles = np.array(record['tiles'])
+        trees = [(int(x), int(y)) for x, y in record['trees'][:record['tree_count']]]
+        rivers = [((int(x), int(y)), (int(w), int(h)))
+                  for x, y, w, h in record['rivers'][:record['river_count']]]
+        return tiles, trees, rivers
+
+    def layout_for_seed(self, seed: int):
+        """按种子取出地图：种子在池中时返回该种子生成的地图，否则按种子对池大小取模"""
+        first = int(self.maps[0]['seed'])
+        if 0 <= seed - first < len(self.maps) and int(self.maps[seed - first]['seed']) == seed:
+            return self.layout(seed - first)
+        return self.layout(seed)
+
+
+# ==================== 程序入口 ====================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量生成地图池")
+    parser.add_argument("output", help="输出的 .npy 文件")
+    parser.add_argument("--count", type=int, default=1000, help="地图数量（默认1000）")
+    parser.add_argument("--width", type=int, default=1200, help="地图宽度（默认1200）")
+    parser.add_argument("--height", type=int, default=1200, help="地图高度（默认1200）")
+    parser.add_argument("--seed", type=int, default=0, help="第一张地图的种子，之后依次加1（默认0）")
+    parser.add_argument("--workers", type=int, help=f"进程数（默认CPU核心数{os.cpu_count()}）")
+    args = parser.parse_args()
+    if args.count < 1:
+        parser.error("地图数量必须为正整数")
+
+    start = time.perf_counter()
+    build_pool(args.output, args.count, args.width, args.height, args.seed, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"已生成 {args.count} 张地图: {args.output} | "
+          f"{os.path.getsize(args.output) / 1024 / 1024:.1f}MB | 耗时: {elapsed:.2f}s")
@@ -0,0 +1,80 @@
+"""输入录制与回放
+
+每个逻辑帧的玩家输入压缩为一个字节：低3位为方向编号，其余位为按键事件。
+文件格式：头部 (魔数, 版本, 随机种子, 世界大小, 地图池标识, 帧数) + zlib压缩的逐帧输入字节。
+世界大小和地图池决定了对局的地形，回放时据此核对，避免用不同的设置回放出另一局游戏。
+"""
+import struct
+import zlib
+from typing import Optional, Tuple
+
+MAGIC = b'TKRP'
+# 游戏逻辑的变化使旧录像无法原样复现时递增
+VERSION = 7
+# 魔数(4字节) | 版本(uint8) | 随机种子(uint64) | 世界边长的地形块数(uint16) |
+# 地图池地图数(uint32，0表示未使用地图池) | 地图池第一张地图的种子(uint64) | 帧数(uint32)，小端
+HEADER = struct.Struct('<4sBQHIQI')
+
+# 输入字节的位布局
+DIRECTION_MASK = 0x07
+SWITCH_MODE = 0x08
+FIRE_PRESSED = 0x10
+FIRE_RELEASED = 0x20
+
+
+def encode_input(direction_index: int, switch_mode: bool, fire_pressed: bool, fire_released: bool) -> int:
+    """将一帧输入编码为一个字节"""
+    value = direction_index & DIRECTION_MASK
+    if switch_mode:
+        value |= SWITCH_MODE
+    if fire_pressed:
+        value |= FIRE_PRESSED
+    if fire_released:
+        value |= FIRE_RELEASED
+    return value
+
+
+def decode_input(value: int) -> Tuple[int, bool, bool, bool]:
+    """将一个字节解码为 (方向编号, 切换模式, 按下开火, 松开开火)"""
+    return (value & DIRECTION_MASK, bool(value & SWITCH_MODE),
+            bool(value & FIRE_PRESSED), bool(value & FIRE_RELEASED))
+
+
+class InputRecorder:
+    """录制一局游戏的逐帧输入
+
+    pool为地图池的标识 (地图数, 第一张地图的种子)，未使用地图池时为None。
+    """
+    def __init__(self, seed: int, world_chunks: int = 1, pool: Optional[Tuple[int, int]] = None):
+        self.seed = seed
+        self.world_chunks = world_chunks
+        self.pool = pool
+        self.frames = bytearray()
+
+    def record(self, direction_index: int, switch_mode: bool, fire_pressed: bool, fire_released: bool):
+        """记录一个逻辑帧的输入"""
+        self.frames.append(encode_input(direction_index, switch_mode, fire_pressed, fire_released))
+
+    def save(self, path: str):
+        """写入录像文件"""
+        pool_size, pool_seed = self.pool if self.pool is not None else (0, 0)
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.seed, self.world_chunks, pool_size, pool_seed,
+                                len(self.frames)))
+            f.write(zlib.compress(bytes(self.frames), 9))
+
+
+def load_replay(path: str) -> Tuple[int, int, Optional[Tuple[int, int]], bytes]:
+    """读取录像文件，返回 (随机种子, 世界大小, 地图池标识, 逐帧输入字节)，未使用地图池时标识为None"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"不是有效的录像文件: {path}")
+    magic, version, seed, world_chunks, pool_size, pool_seed, frame_count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"不是有效的录像文件: {path}")
+    frames = zlib.decompress(data[HEADER.size:])
+    if len(frames) != frame_count:
+        raise ValueError(f"录像文件已损坏: {path}")
+    pool = (pool_size, pool_seed) if pool_size else None
+    return seed, world_chunks, pool, frames